@@ -0,0 +1,681 @@
+"""Benchmark offline dos handlers de interação, sem Discord e sem MongoDB.
+
+Roda os handlers reais do bot (criar_evento, SignupButton/SignupSelect,
+ConfirmationView, AddRoleModal, ConcludeView + LootRepairModal e
+PaymentButton/PaymentSelect) contra Interactions/Mensagens/Servidores falsos e
+coleções em memória, com
+concorrência e latências configuráveis. Mostra vazão, latência p50/p99 por
+handler, edits de mensagem por interação e verifica a consistência do estado
+(nenhuma inscrição perdida, nenhum usuário duplicado, pagamentos corretos).
+Os eventos grandes (--large-events) passam de 25 participantes: o relatório usa
+menus de seleção e o embed compacto.
+
+Uso: python benchmark.py [--events 10] [--large-events 2] [--clicks 200] [--concurrency 50] [--api-latency 0.02]
+"""
+import argparse
+import asyncio
+import collections
+import copy
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import time
+import traceback
+from types import SimpleNamespace
+
+from pymongo.errors import DuplicateKeyError
+
+# O main só lê a variável; o cliente é criado com connect=False e nunca é usado aqui.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import main  # noqa: E402
+from event_store import STATUS_CONCLUDED, STATUS_OPEN  # noqa: E402
+from guild_settings import GuildSettings  # noqa: E402
+from roster import EMBED_MAX_FIELDS, EMBED_TOTAL_LIMIT  # noqa: E402
+from stress_signups import rendered_signups  # noqa: E402
+
+TEMPLATE_NAME = "benchmark"
+LARGE_TEMPLATE_NAME = "benchmark-zvz"
+PAYMENT_LINE_PATTERN = re.compile(r"^(?P<status>[✅❌]) ")
+
+
+# --- Backend em memória ---
+
+class MemoryCollection:
+    """Coleção em memória com o subconjunto da API assíncrona do pymongo usado pelos stores."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.docs: dict = {}
+        self.calls = 0
+        self._ids = itertools.count(1)
+
+    async def _io(self):
+        self.calls += 1
+        await asyncio.sleep(random.uniform(0, self.latency) if self.latency else 0)
+
+    @staticmethod
+    def _match(doc: dict, query: dict):
+        """Retorna (casou?, índice do elemento para o operador posicional `$`)."""
+        position = None
+        for key, value in query.items():
+            if "." in key:
+                array_name, field = key.split(".", 1)
+                items = doc.get(array_name) or []
+                position = next((i for i, item in enumerate(items) if item.get(field) == value), None)
+                if position is None:
+                    return False, None
+            elif isinstance(value, dict) and "$in" in value:
+                if doc.get(key) not in value["$in"]:
+                    return False, None
+            elif doc.get(key) != value:
+                return False, None
+        return True, position
+
+    @staticmethod
+    def _set(doc: dict, fields: dict, position):
+        for key, value in fields.items():
+            if ".$." in key:
+                array_name, field = key.split(".$.", 1)
+                doc[array_name][position][field] = value
+            else:
+                doc[key] = copy.deepcopy(value)
+
+    def _find_first(self, query: dict):
+        for doc in self.docs.values():
+            matched, position = self._match(doc, query)
+            if matched:
+                return doc, position
+        return None, None
+
+    async def create_index(self, keys, **kwargs):
+        await self._io()
+
+    async def find_one(self, query: dict, projection: dict = None):
+        await self._io()
+        doc, _ = self._find_first(query)
+        return copy.deepcopy(doc)
+
+    async def find(self, query: dict, projection: dict = None):
+        await self._io()
+        for doc in list(self.docs.values()):
+            if self._match(doc, query)[0]:
+                yield copy.deepcopy(doc)
+
+    async def insert_one(self, doc: dict):
+        await self._io()
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", next(self._ids))
+        self.docs[doc["_id"]] = doc
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs: list[dict], ordered: bool = True):
+        await self._io()
+        for doc in docs:
+            doc = copy.deepcopy(doc)
+            doc.setdefault("_id", next(self._ids))
+            self.docs[doc["_id"]] = doc
+
+    def _insert_for_upsert(self, query: dict, update: dict) -> dict:
+        if query.get("_id") in self.docs:
+            # O documento existe, mas não casou com o resto do filtro.
+            raise DuplicateKeyError("E11000 duplicate key error")
+        doc = {key: value for key, value in query.items() if "." not in key and not isinstance(value, dict)}
+        doc.setdefault("_id", next(self._ids))
+        self.docs[doc["_id"]] = doc
+        self._set(doc, update.get("$setOnInsert", {}), None)
+        return doc
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await self._io()
+        doc, position = self._find_first(query)
+        if doc is None:
+            if not upsert:
+                return SimpleNamespace(matched_count=0, upserted_id=None)
+            doc = self._insert_for_upsert(query, update)
+        self._set(doc, update.get("$set", {}), position)
+        return SimpleNamespace(matched_count=1, upserted_id=doc["_id"])
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: dict = None, upsert: bool = False):
+        """Retorna o documento de antes da alteração (o padrão do pymongo), ou None se não existia."""
+        await self._io()
+        doc, position = self._find_first(query)
+        if doc is None:
+            if upsert:
+                self._set(self._insert_for_upsert(query, update), update.get("$set", {}), None)
+            return None
+        before = copy.deepcopy(doc)
+        self._set(doc, update.get("$set", {}), position)
+        return before
+
+    async def delete_one(self, query: dict):
+        await self._io()
+        doc, _ = self._find_first(query)
+        if doc is not None:
+            del self.docs[doc["_id"]]
+        return SimpleNamespace(deleted_count=int(doc is not None))
+
+
+# --- Discord falso ---
+
+class FakeAPI:
+    """Conta as chamadas "à API" e simula a latência de cada uma."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self._ids = itertools.count(10 ** 17)
+
+    async def call(self, route: str):
+        self.calls[route] += 1
+        await asyncio.sleep(random.uniform(0, self.latency) if self.latency else 0)
+
+    def snowflake(self) -> int:
+        return next(self._ids)
+
+
+class FakeUser:
+    def __init__(self, user_id: int, guild=None):
+        self.id = user_id
+        self.guild = guild
+        self.display_name = f"Jogador {user_id}"
+        self.mention = f"<@{user_id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeGuild:
+    """Servidor sem cache de membros (como com LOW_MEMORY_MEMBERS=1): nomes vêm de query_members."""
+
+    def __init__(self, api: FakeAPI, members: dict[int, FakeUser]):
+        self.api = api
+        self.id = api.snowflake()
+        self.members = members
+
+    def get_member(self, user_id: int):
+        return None
+
+    async def query_members(self, user_ids: list[int], limit: int = 5, cache: bool = True):
+        await self.api.call("query_members")
+        return [self.members[user_id] for user_id in user_ids if user_id in self.members][:limit]
+
+    async def fetch_member(self, user_id: int):
+        await self.api.call("fetch_member")
+        return self.members[user_id]
+
+
+class FakeChannel:
+    def __init__(self, api: FakeAPI, guild: FakeGuild):
+        self.api = api
+        self.id = api.snowflake()
+        self.guild = guild
+        self.mention = f"<#{self.id}>"
+        self.messages: dict[int, "FakeMessage"] = {}
+
+    def _create_message(self, content=None, embed=None, view=None) -> "FakeMessage":
+        message = FakeMessage(self.api, self, content, embed, view)
+        self.messages[message.id] = message
+        return message
+
+    async def send(self, content=None, *, embed=None, view=None):
+        await self.api.call("send_message")
+        return self._create_message(content, embed, view)
+
+    async def fetch_message(self, message_id: int) -> "FakeMessage":
+        await self.api.call("fetch_message")
+        return self.messages[message_id]
+
+
+class FakeMessage:
+    def __init__(self, api: FakeAPI, channel: FakeChannel, content=None, embed=None, view=None):
+        self.api = api
+        self.id = api.snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.embeds = [embed] if embed else []
+        self.view = view
+        self.edits = 0
+        self.interaction_metadata = None
+        self.thread = None
+
+    async def edit(self, **kwargs):
+        await self.api.call("edit_message")
+        self.edits += 1
+        if "content" in kwargs:
+            self.content = kwargs["content"]
+        if "embed" in kwargs:
+            self.embeds = [kwargs["embed"]] if kwargs["embed"] else []
+        if "view" in kwargs:
+            self.view = kwargs["view"]
+
+    async def create_thread(self, name: str) -> FakeChannel:
+        await self.api.call("create_thread")
+        self.thread = FakeChannel(self.api, self.guild)
+        return self.thread
+
+
+class FakeResponse:
+    """InteractionResponse falso: só pode responder uma vez, como o real."""
+
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self.sent: list[dict] = []
+        self.modal = None
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, route: str):
+        if self._done:
+            raise RuntimeError("A interação já foi respondida.")
+        self._done = True
+        await self.interaction.api.call(route)
+
+    async def send_message(self, content=None, *, embed=None, view=None, ephemeral: bool = False):
+        await self._respond("interaction_response")
+        self.sent.append({"content": content, "embed": embed, "view": view, "ephemeral": ephemeral})
+        if not ephemeral:
+            self.interaction.original = self.interaction.channel._create_message(content, embed, view)
+
+    async def defer(self, ephemeral: bool = False, thinking: bool = False):
+        await self._respond("interaction_defer")
+
+    async def edit_message(self, **kwargs):
+        await self._respond("interaction_edit")
+        self.sent.append(kwargs)
+
+    async def send_modal(self, modal):
+        await self._respond("interaction_modal")
+        self.modal = modal
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self.sent: list[dict] = []
+
+    async def send(self, content=None, *, embed=None, view=None, ephemeral: bool = False):
+        if not self.interaction.response.is_done():
+            raise RuntimeError("Followup enviado antes de responder à interação.")
+        await self.interaction.api.call("followup")
+        self.sent.append({"content": content, "embed": embed, "view": view, "ephemeral": ephemeral})
+
+
+class FakeInteraction:
+    def __init__(self, api: FakeAPI, user: FakeUser, channel: FakeChannel, message: FakeMessage = None, data: dict = None):
+        self.api = api
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild = channel.guild
+        self.guild_id = channel.guild.id
+        self.message = message
+        self.data = data or {}
+        self.extras = {}
+        self.command = None
+        self.original = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def original_response(self) -> FakeMessage:
+        await self.api.call("original_response")
+        return self.original
+
+    async def edit_original_response(self, **kwargs):
+        await self.api.call("edit_original_response")
+
+
+# --- Benchmark ---
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Benchmark:
+    def __init__(self, args):
+        self.args = args
+        self.api = FakeAPI(args.api_latency)
+        self.users = {user_id: FakeUser(user_id) for user_id in range(1, args.users + 1)}
+        self.guild = FakeGuild(self.api, self.users)
+        for user in self.users.values():
+            user.guild = self.guild
+        self.author = FakeUser(args.users + 1, self.guild)
+        self.users[self.author.id] = self.author
+        self.event_channel = FakeChannel(self.api, self.guild)
+        self.report_channel = FakeChannel(self.api, self.guild)
+        self.latencies: dict[str, list[float]] = collections.defaultdict(list)
+        self.phases: list[tuple] = []
+        self.errors = 0
+        self.failures: list[str] = []
+        self.event_messages: list[FakeMessage] = []
+
+    def setup(self):
+        collections_by_store = (main.templates, main.event_store, main.payment_store, main.payout_ledger, main.guild_settings)
+        for store in collections_by_store:
+            store.collection = MemoryCollection(self.args.db_latency)
+        main.templates.legacy_collection = None
+        main.edit_coalescer.window = self.args.edit_window
+        channels = {channel.id: channel for channel in (self.event_channel, self.report_channel)}
+        # Os canais são buscados pelo ID no cache do bot.
+        main.bot.get_channel = channels.get
+        main.guild_settings.cache[self.guild.id] = GuildSettings(self.guild.id, report_channel_id=self.report_channel.id)
+        main.data_ready.set()
+        main.job_queue.start()
+
+    async def timed(self, name: str, handler):
+        start = time.perf_counter()
+        try:
+            await handler()
+        except Exception:
+            self.errors += 1
+            if self.errors <= 3:
+                traceback.print_exc()
+        finally:
+            self.latencies[name].append(time.perf_counter() - start)
+
+    async def run_phase(self, name: str, jobs: list):
+        """Roda os jobs (name, handler) com a concorrência configurada e mede a fase inteira."""
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        edits_before = self.api.calls["edit_message"]
+
+        async def guarded(job):
+            async with semaphore:
+                await self.timed(*job)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(guarded(job) for job in jobs))
+        elapsed = time.perf_counter() - start
+        await self.settle()
+        self.phases.append((name, len(jobs), elapsed, self.api.calls["edit_message"] - edits_before))
+
+    async def settle(self):
+        """Espera os atores, os jobs em segundo plano e os edits agrupados terminarem."""
+        while main.event_actors:
+            actors = list(main.event_actors.values())
+            for actor in actors:
+                actor.idle_timeout = 0.01
+                actor.submit(lambda roster: None)
+            await asyncio.gather(*(actor.task for actor in actors))
+        await main.job_queue.join()
+        await main.edit_coalescer.drain()
+
+    # --- Fases ---
+
+    async def create_events(self):
+        slots = [f"Vaga {i} x{self.args.capacity}" for i in range(self.args.slots)]
+        await main.templates.save(self.guild.id, TEMPLATE_NAME, slots)
+        large_slots = [f"Vaga {i} x{self.args.large_capacity}" for i in range(self.args.slots)]
+        await main.templates.save(self.guild.id, LARGE_TEMPLATE_NAME, large_slots)
+
+        def create(i: int, template: str):
+            interaction = FakeInteraction(self.api, self.author, self.event_channel)
+
+            async def handler():
+                await main.criar_evento.callback(
+                    interaction, titulo=f"Evento {i}", horario="21:00", descricao="Benchmark.", template=template
+                )
+                self.event_messages.append(interaction.original)
+            return "criar_evento", handler
+
+        jobs = [create(i, TEMPLATE_NAME) for i in range(self.args.events)]
+        jobs += [create(self.args.events + i, LARGE_TEMPLATE_NAME) for i in range(self.args.large_events)]
+        await self.run_phase("criar_evento", jobs)
+
+    async def signups(self) -> tuple[set, list]:
+        signed = set()
+        swaps = []
+        user_ids = [user_id for user_id in self.users if user_id != self.author.id]
+
+        def click(message: FakeMessage):
+            user = self.users[random.choice(user_ids)]
+            slot = random.choice(main.event_rosters[message.id].slots)
+            if len(main.event_rosters[message.id].slots) > main.MAX_SIGNUP_BUTTONS:
+                interaction = FakeInteraction(self.api, user, self.event_channel, message, {"values": [slot]})
+                item = main.SignupSelect(0)
+            else:
+                interaction = FakeInteraction(self.api, user, self.event_channel, message)
+                item = main.SignupButton(slot)
+
+            async def handler():
+                await item.callback(interaction)
+                if not interaction.followup.sent:
+                    signed.add((message.id, user.id))
+                for followup in interaction.followup.sent:
+                    if isinstance(followup["view"], main.ConfirmationView):
+                        swaps.append((user, followup["view"]))
+            return "signup", handler
+
+        jobs = [click(message) for message in self.event_messages for _ in range(self.args.clicks)]
+        random.shuffle(jobs)
+        await self.run_phase("signup", jobs)
+        return signed, swaps
+
+    async def confirm_swaps(self, swaps: list):
+        def answer(user: FakeUser, view):
+            interaction = FakeInteraction(self.api, user, self.event_channel)
+            # Metade confirma a troca, metade desiste.
+            button = view.confirm_button if random.random() < 0.5 else view.cancel_button
+            return "confirm_swap", lambda: button.callback(interaction)
+
+        await self.run_phase("confirm_swap", [answer(user, view) for user, view in swaps])
+
+    async def add_roles(self) -> dict[int, list]:
+        """Cada criador adiciona a mesma vaga duas vezes ao mesmo tempo: só uma pode entrar."""
+        responses = collections.defaultdict(list)
+
+        def submit(message: FakeMessage):
+            interaction = FakeInteraction(self.api, self.author, self.event_channel, message)
+            modal = main.AddRoleModal()
+            modal.role_name_input._value = f"Reserva x{self.args.capacity}"
+
+            async def handler():
+                await modal.on_submit(interaction)
+                responses[message.id].append(interaction.followup.sent)
+            return "add_role", handler
+
+        await self.run_phase("add_role", [submit(message) for message in self.event_messages for _ in range(2)])
+        return responses
+
+    async def conclude(self) -> dict[int, list[int]]:
+        participants = {message.id: main.event_rosters[message.id].participants() for message in self.event_messages}
+
+        def conclude_event(message: FakeMessage):
+            async def prompt():
+                click = FakeInteraction(self.api, self.author, self.event_channel, message)
+                await main.EventControlButton("conclude_event").callback(click)
+                view = click.response.sent[0]["view"]
+
+                answer = FakeInteraction(self.api, self.author, self.event_channel)
+                await view.no_button.callback(answer)
+                modal = answer.response.modal
+                modal.loot_input._value = "1000000"
+                modal.repair_input._value = "200000"
+                return modal
+
+            async def handler():
+                # Dois prompts de Concluir abertos e enviados juntos: só um relatório pode sair.
+                modals = [await prompt(), await prompt()]
+                await asyncio.gather(*(modal.on_submit(FakeInteraction(self.api, self.author, self.event_channel)) for modal in modals))
+            return "loot_repair", handler
+
+        await self.run_phase("loot_repair", [conclude_event(message) for message in self.event_messages])
+        return participants
+
+    async def payments(self) -> collections.Counter:
+        toggles = collections.Counter()
+        report_messages = list(self.report_channel.messages.values())
+        # Como um relatório que não foi recarregado na inicialização: volta do MongoDB no primeiro clique.
+        main.payment_reports.pop(report_messages[0].id, None)
+
+        def pay(message: FakeMessage, user_id: int):
+            interaction = FakeInteraction(self.api, self.author, self.report_channel, message)
+
+            async def handler():
+                await main.PaymentButton(user_id).callback(interaction)
+                toggles[(message.id, user_id)] += 1
+            return "payment", handler
+
+        def pay_select(message: FakeMessage, participant_ids: list[int]):
+            # Relatório grande: um menu por 25 participantes, vários marcados de uma vez.
+            page = random.randrange((len(participant_ids) + main.SELECT_MAX_OPTIONS - 1) // main.SELECT_MAX_OPTIONS)
+            options = participant_ids[page * main.SELECT_MAX_OPTIONS:(page + 1) * main.SELECT_MAX_OPTIONS]
+            user_ids = random.sample(options, random.randint(1, min(3, len(options))))
+            interaction = FakeInteraction(self.api, self.author, self.report_channel, message,
+                                          {"values": [str(user_id) for user_id in user_ids]})
+
+            async def handler():
+                await main.PaymentSelect(page).callback(interaction)
+                for user_id in user_ids:
+                    toggles[(message.id, user_id)] += 1
+            return "payment", handler
+
+        jobs = []
+        for message in report_messages:
+            participant_ids = [p["user_id"] for p in main.payment_store.collection.docs[message.id]["participants"]]
+            if len(participant_ids) > main.MAX_PAYMENT_BUTTONS:
+                jobs += [pay_select(message, participant_ids) for _ in range(self.args.payment_clicks)]
+            elif participant_ids:
+                jobs += [pay(message, random.choice(participant_ids)) for _ in range(self.args.payment_clicks)]
+        await self.run_phase("payment", jobs)
+        return toggles
+
+    # --- Verificações ---
+
+    def check(self, ok: bool, description: str):
+        if not ok:
+            self.failures.append(description)
+
+    def check_rosters(self, signed: set):
+        events = main.event_store.collection.docs
+        for message in self.event_messages:
+            roster = main.event_rosters[message.id]
+            for slot in roster.slots:
+                self.check(len(roster.members(slot)) <= roster.capacity[slot], f"vaga '{slot}' acima da capacidade em {message.id}")
+            lost = [user_id for event_id, user_id in signed if event_id == message.id and roster.slot_of(user_id) is None]
+            self.check(not lost, f"{len(lost)} inscrição(ões) perdida(s) no evento {message.id}")
+            rendered = rendered_signups(message.embeds[0])
+            self.check(rendered == dict(roster.user_to_slot), f"embed do evento {message.id} diferente do roster")
+            saved = events.get(message.id, {}).get("slots")
+            self.check(saved == roster.to_document()["slots"], f"documento do evento {message.id} diferente do roster")
+
+    def check_add_roles(self, responses: dict[int, list]):
+        for message in self.event_messages:
+            roster = main.event_rosters[message.id]
+            rejected = sum(1 for sent in responses[message.id] if sent)
+            self.check(roster.slots.count("Reserva") == 1 and rejected == 1, f"vaga duplicada aceita no evento {message.id}")
+
+    def check_conclusions(self, participants: dict[int, list[int]]):
+        ledger = main.payout_ledger.collection.docs.values()
+        reports_by_event = {doc["event_id"]: doc for doc in main.payment_store.collection.docs.values()}
+        report_counts = collections.Counter(doc["event_id"] for doc in main.payment_store.collection.docs.values())
+        for message in self.event_messages:
+            status = main.event_store.collection.docs[message.id]["status"]
+            self.check(status == STATUS_CONCLUDED, f"evento {message.id} não foi marcado como concluído")
+            self.check(message.id not in main.event_rosters and not message.embeds, f"evento {message.id} continua aberto")
+            report = reports_by_event.get(message.id)
+            if not participants[message.id]:
+                continue
+            if report is None:
+                self.failures.append(f"evento {message.id} sem relatório de pagamento")
+                continue
+            self.check(report_counts[message.id] == 1, f"evento {message.id} concluído {report_counts[message.id]} vezes")
+            paid_ids = [participant["user_id"] for participant in report["participants"]]
+            self.check(sorted(paid_ids) == sorted(participants[message.id]), f"relatório do evento {message.id} com participantes errados")
+            entries = [entry for entry in ledger if entry["report_id"] == report["_id"]]
+            self.check(len(entries) == len(participants[message.id]), f"livro-caixa do relatório {report['_id']} incompleto")
+
+    def check_payments(self, toggles: collections.Counter):
+        ledger = {(entry["report_id"], entry["user_id"]): entry for entry in main.payout_ledger.collection.docs.values()}
+        for message in self.report_channel.messages.values():
+            report = main.payment_reports[message.id]
+            doc = main.payment_store.collection.docs[message.id]
+            stored = {p["user_id"]: p["paid"] for p in doc["participants"]}
+            expected_status = STATUS_CONCLUDED if report.settled() else STATUS_OPEN
+            self.check(doc["status"] == expected_status, f"relatório {message.id} com status {doc['status']}, esperado {expected_status}")
+            for user_id, paid in report.paid.items():
+                expected = toggles[(message.id, user_id)] % 2 == 1
+                self.check(paid == expected, f"pagamento de {user_id} no relatório {message.id} perdido")
+                self.check(stored[user_id] == paid, f"pagamento de {user_id} no relatório {message.id} não foi salvo")
+                self.check(ledger[(message.id, user_id)]["paid"] == paid, f"livro-caixa de {user_id} no relatório {message.id} desatualizado")
+            if len(report.paid) > main.MAX_PAYMENT_BUTTONS:
+                lines = [PAYMENT_LINE_PATTERN.match(line) for field in message.embeds[0].fields for line in field.value.splitlines()]
+                statuses = [line["status"] == "✅" for line in lines if line]
+                options = [option for item in message.view.children if isinstance(item, main.PaymentSelect) for option in item.item.options]
+                self.check(len(message.embeds[0].fields) <= EMBED_MAX_FIELDS and len(message.embeds[0]) <= EMBED_TOTAL_LIMIT,
+                           f"embed do relatório {message.id} acima dos limites do Discord")
+                self.check(len(options) == len(report.paid), f"menus do relatório {message.id} sem todos os participantes")
+            else:
+                statuses = [field.value == "✅ Pago" for field in message.embeds[0].fields]
+            self.check(statuses == list(report.paid.values()), f"embed do relatório {message.id} desatualizado")
+
+    # --- Relatório ---
+
+    def report(self):
+        print(f"{'fase':<14} {'interações':>10} {'vazão/s':>10} {'edits':>7} {'edits/int.':>10}")
+        for name, count, elapsed, edits in self.phases:
+            throughput = count / elapsed if elapsed else 0.0
+            per_interaction = edits / count if count else 0.0
+            print(f"{name:<14} {count:>10} {throughput:>10.1f} {edits:>7} {per_interaction:>10.2f}")
+
+        print(f"\n{'handler':<14} {'chamadas':>10} {'p50 ms':>10} {'p99 ms':>10} {'máx ms':>10}")
+        for name, values in self.latencies.items():
+            print(f"{name:<14} {len(values):>10} {percentile(values, 0.5) * 1000:>10.1f} "
+                  f"{percentile(values, 0.99) * 1000:>10.1f} {max(values) * 1000:>10.1f}")
+
+        calls = ", ".join(f"{route}={count}" for route, count in sorted(self.api.calls.items()))
+        print(f"\nChamadas à API: {calls}")
+        for kind, stats in main.edit_coalescer.stats().items():
+            print(f"Edits de {kind}: {stats['requested']:.0f} solicitados, {stats['issued']:.0f} enviados.")
+
+    async def run(self) -> bool:
+        self.setup()
+        await self.create_events()
+        signed, swaps = await self.signups()
+        await self.confirm_swaps(swaps)
+        self.check_rosters(signed)
+        self.check_add_roles(await self.add_roles())
+        self.check_conclusions(await self.conclude())
+        self.check_payments(await self.payments())
+        if self.args.large_events:
+            large = sum(1 for report in main.payment_reports.values() if len(report.paid) > main.MAX_PAYMENT_BUTTONS)
+            self.check(large == self.args.large_events, f"{large} de {self.args.large_events} evento(s) grande(s) com relatório de mais de {main.MAX_PAYMENT_BUTTONS} participantes")
+
+        self.report()
+        self.check(self.errors == 0, f"{self.errors} handler(s) terminaram com exceção")
+        for failure in self.failures:
+            print(f"FALHA: {failure}")
+        if not self.failures:
+            print("OK: nenhuma inscrição perdida, nenhum usuário duplicado, pagamentos consistentes.")
+        return not self.failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10, help="Eventos criados.")
+    parser.add_argument("--slots", type=int, default=4, help="Vagas por evento (mais de 20 usa menus de seleção).")
+    parser.add_argument("--capacity", type=int, default=5, help="Jogadores por vaga.")
+    parser.add_argument("--large-events", type=int, default=2, help="Eventos grandes (relatório com mais de 25 participantes).")
+    parser.add_argument("--large-capacity", type=int, default=15, help="Jogadores por vaga nos eventos grandes.")
+    parser.add_argument("--users", type=int, default=150, help="Jogadores distintos clicando.")
+    parser.add_argument("--clicks", type=int, default=200, help="Cliques de inscrição por evento.")
+    parser.add_argument("--payment-clicks", type=int, default=50, help="Cliques de pagamento por relatório.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Interações em andamento ao mesmo tempo.")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Latência máxima simulada de cada chamada ao Discord (s).")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="Latência máxima simulada de cada operação no banco (s).")
+    parser.add_argument("--edit-window", type=float, default=main.edit_coalescer.window, help="Janela do agrupamento de edits (s).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    random.seed(args.seed)
+    sys.exit(0 if asyncio.run(Benchmark(args).run()) else 1)
@@ -0,0 +1,194 @@
+"""Verifica o OutboundScheduler contra um HTTPClient falso: prioridade, edits substituídos e cancelamento.
+
+Uso: python check_outbound.py [--window 0.1] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import sys
+
+from discord.http import Route
+
+from outbound import PRIORITY_EDIT, PRIORITY_INTERACTION, PRIORITY_NAMES, PRIORITY_NORMAL, OutboundScheduler, \
+    priority, requests_queued
+
+SEND_ROUTE = ("POST", "/channels/{channel_id}/messages")
+EDIT_ROUTE = ("PATCH", "/channels/{channel_id}/messages/{message_id}")
+CHANNEL_ID = 1
+
+# HTTPClient falso da verificação atual, já com o scheduler instalado.
+http: "FakeHTTP" = None
+
+
+class FakeRatelimit:
+    """O que o scheduler lê do estado de rate limit do discord.py."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.remaining = limit
+        self.expires = None
+
+
+class FakeHTTP:
+    """HTTPClient falso: buckets com janela fixa, latência constante e registro do que foi enviado."""
+
+    def __init__(self, limit: int, window: float, latency: float):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self._buckets: dict[str, FakeRatelimit] = {}
+        # Envios e edits da mesma mensagem no mesmo bucket, como o Discord às vezes faz.
+        self._bucket_hashes = {f"{SEND_ROUTE[0]} {SEND_ROUTE[1]}": "shared", f"{EDIT_ROUTE[0]} {EDIT_ROUTE[1]}": "shared"}
+        self.sent: list = []
+        self.too_many = 0
+
+    def bucket(self, route) -> FakeRatelimit:
+        key = f"{self._bucket_hashes.get(route.key) or route.key}:{route.major_parameters}"
+        return self._buckets.setdefault(key, FakeRatelimit(self.limit))
+
+    async def request(self, route, **kwargs):
+        loop = asyncio.get_running_loop()
+        ratelimit = self.bucket(route)
+        if ratelimit.expires is None or loop.time() >= ratelimit.expires:
+            ratelimit.remaining = ratelimit.limit
+            ratelimit.expires = loop.time() + self.window
+        if ratelimit.remaining <= 0:
+            self.too_many += 1
+        ratelimit.remaining -= 1
+        payload = kwargs["json"]
+        self.sent.append(payload)
+        await asyncio.sleep(self.latency)
+        return {"id": len(self.sent), "payload": payload}
+
+
+def send(label) -> asyncio.Task:
+    return asyncio.create_task(http.request(Route(*SEND_ROUTE, channel_id=CHANNEL_ID), json={"content": label}))
+
+
+def edit(message_id: int, **payload) -> asyncio.Task:
+    route = Route(*EDIT_ROUTE, channel_id=CHANNEL_ID, message_id=message_id)
+    return asyncio.create_task(http.request(route, json=payload))
+
+
+def exhaust():
+    """Esgota a janela atual do bucket: o que vier depois espera o reset, já na fila de prioridade."""
+    ratelimit = http.bucket(Route(*SEND_ROUTE, channel_id=CHANNEL_ID))
+    ratelimit.remaining = 0
+    ratelimit.expires = asyncio.get_running_loop().time() + http.window
+
+
+def check(condition: bool, description: str) -> bool:
+    if not condition:
+        print(f"FALHA: {description}")
+    return condition
+
+
+async def check_priority() -> bool:
+    exhaust()
+    start = len(http.sent)
+    tasks = [edit(100 + i, embeds=[f"edit {i}"]) for i in range(4)]
+    tasks += [send(f"normal {i}") for i in range(4)]
+    with priority(PRIORITY_INTERACTION):
+        tasks += [send(f"interaction {i}") for i in range(4)]
+    await asyncio.gather(*tasks)
+
+    def level(payload) -> int:
+        if "embeds" in payload:
+            return PRIORITY_EDIT
+        return PRIORITY_INTERACTION if payload["content"].startswith("interaction") else PRIORITY_NORMAL
+
+    order = [level(payload) for payload in http.sent[start:]]
+    return check(order == sorted(order), f"ordem de envio fora de prioridade: {[PRIORITY_NAMES[lvl] for lvl in order]}")
+
+
+async def check_collapsing() -> bool:
+    exhaust()
+    start = len(http.sent)
+    same = [edit(200, embeds=[f"versão {i}"]) for i in range(5)]
+    # Um edit com menos campos não substitui o anterior: os dois saem.
+    wider = edit(201, embeds=["completo"], components=["botões"])
+    narrower = edit(201, embeds=["só o embed"])
+    results = await asyncio.gather(*same, wider, narrower)
+    sent = http.sent[start:]
+    ok = check(sent.count({"embeds": ["versão 4"]}) == 1 and not any(p in sent for p in ({"embeds": [f"versão {i}"]} for i in range(4))),
+               "5 edits da mesma mensagem na fila não viraram um só envio do mais novo")
+    ok &= check(all(result == results[0] for result in results[:5]), "os edits substituídos não receberam o resultado do envio")
+    ok &= check({"embeds": ["completo"], "components": ["botões"]} in sent and {"embeds": ["só o embed"]} in sent,
+                "um edit com menos campos substituiu outro com mais")
+    return ok
+
+
+async def check_cancellation() -> bool:
+    ok = True
+
+    # O edit mais novo é cancelado ainda na fila: o que ele substituiu é enviado.
+    exhaust()
+    older = edit(300, embeds=["antigo"])
+    newer = edit(300, embeds=["novo"])
+    await asyncio.sleep(0)
+    newer.cancel()
+    result = await older
+    ok &= check(result["payload"] == {"embeds": ["antigo"]}, "o edit substituído não foi enviado quando o mais novo foi cancelado")
+    ok &= check(newer.cancelled(), "o edit cancelado não terminou cancelado")
+
+    # Cadeia de substituições: só o mais novo dos que restam é enviado, e responde pelos outros.
+    exhaust()
+    start = len(http.sent)
+    chain = [edit(301, embeds=[f"versão {i}"]) for i in range(3)]
+    await asyncio.sleep(0)
+    chain[-1].cancel()
+    first, second = await asyncio.gather(*chain[:2])
+    ok &= check(http.sent[start:] == [{"embeds": ["versão 1"]}], f"cadeia cancelada enviou {http.sent[start:]}")
+    ok &= check(first == second, "o edit mais antigo não recebeu o resultado do que o substituiu")
+
+    # Cancelado durante o envio: não dá para saber se chegou, então o substituído também sai.
+    exhaust()
+    older = edit(302, embeds=["antigo"])
+    newer = edit(302, embeds=["novo"])
+    while {"embeds": ["novo"]} not in http.sent:
+        await asyncio.sleep(0.005)
+    newer.cancel()
+    result = await older
+    ok &= check(result["payload"] == {"embeds": ["antigo"]}, "o edit substituído se perdeu quando o envio do mais novo foi cancelado")
+
+    # Uma chamada cancelada na fila não segura as outras.
+    exhaust()
+    start = len(http.sent)
+    dropped = send("cancelada")
+    kept = send("mantida")
+    await asyncio.sleep(0)
+    dropped.cancel()
+    await kept
+    ok &= check(http.sent[start:] == [{"content": "mantida"}], f"fila depois do cancelamento enviou {http.sent[start:]}")
+    return ok
+
+
+async def run(window: float, latency: float) -> bool:
+    global http
+    fake = FakeHTTP(limit=3, window=window, latency=latency)
+    scheduler = OutboundScheduler()
+    scheduler.install(fake)
+    http = fake
+    ok = True
+    for name, scenario in (("prioridade", check_priority), ("substituição", check_collapsing), ("cancelamento", check_cancellation)):
+        try:
+            passed = await asyncio.wait_for(scenario(), timeout=30 * window + 5)
+        except asyncio.TimeoutError:
+            print(f"FALHA: {name}: travou.")
+            passed = False
+        print(f"{name}: {'ok' if passed else 'falhou'}")
+        ok &= passed
+    await asyncio.sleep(window)
+    ok &= check(fake.too_many == 0, f"{fake.too_many} chamada(s) passaram do limite do bucket")
+    ok &= check(not scheduler.gates, f"filas ainda abertas: {list(scheduler.gates)}")
+    ok &= check(all(requests_queued.get(priority=name) == 0 for name in PRIORITY_NAMES.values()), "contagem de chamadas na fila não voltou a zero")
+    if ok:
+        print("OK: prioridade, substituição e cancelamento se comportaram como esperado.")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--window", type=float, default=0.1, help="janela de rate limit do bucket falso, em segundos")
+    parser.add_argument("--latency", type=float, default=0.02, help="latência de cada chamada falsa, em segundos")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.window, args.latency)) else 1)
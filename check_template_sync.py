@@ -0,0 +1,102 @@
+"""Verifica a sincronização dos templates entre instâncias num MongoDB de verdade.
+
+Simula duas instâncias do bot (dois TemplateStore) sobre uma coleção temporária:
+a instância A e um "admin" escrevem, e a instância B precisa ver cada alteração
+em menos de --max-lag segundos, sem reler a coleção. Com um replica set testa o
+change stream; com --poll (ou num standalone) testa a consulta periódica.
+
+Uso: MONGO_URI=mongodb://localhost:27017/?replicaSet=rs0 python check_template_sync.py [--poll]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import time
+import uuid
+
+from pymongo import AsyncMongoClient
+
+from template_store import TemplateStore
+from template_watcher import TemplateWatcher
+
+GUILD_ID = 1
+OTHER_GUILD_ID = 2
+
+
+async def wait_for(condition, max_lag: float) -> float | None:
+    """Segundos até `condition()` ficar verdadeira, ou None se passar de `max_lag`."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < max_lag:
+        if condition():
+            return time.perf_counter() - start
+        await asyncio.sleep(0.01)
+    return None
+
+
+async def run(uri: str, poll: bool, max_lag: float) -> bool:
+    client = AsyncMongoClient(uri)
+    db = client.get_database(f"template_sync_check_{uuid.uuid4().hex[:8]}")
+    collection = db.get_collection("guild_templates")
+    instance_a, instance_b = TemplateStore(collection), TemplateStore(collection)
+    await instance_a.load()
+    await instance_b.load()
+
+    watcher = TemplateWatcher(instance_b, force_polling=poll)
+    task = asyncio.create_task(watcher.run())
+    # Espera o stream abrir (ou a primeira consulta) antes de começar a escrever.
+    await asyncio.sleep(0.5)
+
+    def now():
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    steps = [
+        ("A cria", lambda: instance_a.save(GUILD_ID, "zvz", ["Tank", "Healer"]),
+         lambda: instance_b.get(GUILD_ID, "zvz") == ["Tank", "Healer"]),
+        ("A altera", lambda: instance_a.save(GUILD_ID, "zvz", ["Tank", "Healer", "DPS"]),
+         lambda: instance_b.get(GUILD_ID, "zvz") == ["Tank", "Healer", "DPS"]),
+        ("admin altera no banco", lambda: collection.update_one(
+            {"guild_id": GUILD_ID, "name": "zvz"}, {"$set": {"roles": ["Scout"], "updated_at": now()}}),
+         lambda: instance_b.get(GUILD_ID, "zvz") == ["Scout"]),
+        ("A exclui", lambda: instance_a.delete(GUILD_ID, "zvz"),
+         lambda: instance_b.get(GUILD_ID, "zvz") is None and not instance_b.suggest(GUILD_ID, "zv")),
+        ("A recria", lambda: instance_a.save(GUILD_ID, "zvz", ["Tank"]),
+         lambda: instance_b.get(GUILD_ID, "zvz") == ["Tank"]),
+        ("A cria um global", lambda: instance_a.save(None, "raid", ["Caller"]),
+         lambda: instance_b.get(GUILD_ID, "raid") == ["Caller"]),
+        ("A esconde o global", lambda: instance_a.hide(GUILD_ID, "raid"),
+         lambda: instance_b.get(GUILD_ID, "raid") is None and instance_b.get(OTHER_GUILD_ID, "raid") == ["Caller"]),
+    ]
+    if not poll:
+        # Exclusões de verdade (sem lápide) só aparecem pelo change stream.
+        steps.append(("admin apaga no banco", lambda: collection.delete_one({"guild_id": GUILD_ID, "name": "zvz"}),
+                      lambda: instance_b.get(GUILD_ID, "zvz") is None))
+
+    ok = True
+    try:
+        for description, write, condition in steps:
+            await write()
+            lag = await wait_for(condition, max_lag)
+            if lag is None:
+                print(f"FALHA: {description}: a instância B não viu a alteração em {max_lag:.1f}s.")
+                ok = False
+            else:
+                print(f"{description:<24} visto pela instância B em {lag * 1000:7.1f} ms")
+        print(f"Modo: {watcher.mode}.")
+    finally:
+        task.cancel()
+        await client.drop_database(db.name)
+        await client.close()
+    if ok:
+        print("OK: todas as alterações chegaram à outra instância.")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--poll", action="store_true", help="Força a consulta periódica em vez do change stream.")
+    parser.add_argument("--max-lag", type=float, default=1.0, help="Atraso máximo aceito por alteração (s).")
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/?replicaSet=rs0&directConnection=true")
+    sys.exit(0 if asyncio.run(run(uri, args.poll, args.max_lag)) else 1)
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+
+from metrics import counter
+from outbound import PRIORITY_EDIT, priority
+
+# --- Coalescência de Edits ---
+# Em vez de um PATCH por clique, as alterações só marcam a mensagem como "suja".
+# Um worker por mensagem faz no máximo um edit por janela, sempre renderizando
+# o estado mais recente no momento do envio. Os edits saem com a prioridade mais
+# baixa (ver outbound.py), mesmo quando marcados a partir de um handler.
+
+edits_requested = counter("message_edits_requested_total", "Edits de mensagem solicitados pelos handlers.")
+edits_issued = counter("message_edits_issued_total", "Edits de mensagem efetivamente enviados ao Discord.")
+
+
+class EditCoalescer:
+    """Agrupa os edits de cada mensagem: no máximo um por `window` segundos."""
+
+    def __init__(self, window: float = 1.0):
+        self.window = window
+        # message_id -> [mensagem, render, opções acumuladas, tipo]
+        self._pending: dict[int, list] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def mark_dirty(self, message, render, kind: str = "event", **options):
+        """Agenda um edit. `render(**options)` deve retornar os kwargs de `message.edit`.
+
+        As opções booleanas de marcações que forem agrupadas são combinadas com OR
+        (ex.: se qualquer alteração mudou o layout, os botões são re-renderizados).
+        """
+        edits_requested.inc(kind=kind)
+        entry = self._pending.get(message.id)
+        if entry is None:
+            self._pending[message.id] = [message, render, dict(options), kind]
+        else:
+            entry[0] = message
+            entry[1] = render
+            for key, value in options.items():
+                entry[2][key] = entry[2].get(key) or value
+
+        if message.id not in self._tasks:
+            self._tasks[message.id] = asyncio.create_task(self._flush_loop(message.id), name=f"edit-coalescer-{message.id}")
+
+    def discard(self, message_id: int):
+        """Descarta edits pendentes (ex.: a mensagem foi encerrada ou apagada)."""
+        self._pending.pop(message_id, None)
+        task = self._tasks.pop(message_id, None)
+        if task:
+            task.cancel()
+
+    async def drain(self):
+        """Espera todos os edits pendentes serem enviados (ex.: antes de desligar o bot)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    async def _flush_loop(self, message_id: int):
+        try:
+            # Cede o loop uma vez para juntar as marcações feitas no mesmo ciclo.
+            await asyncio.sleep(0)
+            while message_id in self._pending:
+                message, render, options, kind = self._pending.pop(message_id)
+                edits_issued.inc(kind=kind)
+                try:
+                    with priority(PRIORITY_EDIT):
+                        await message.edit(**render(**options))
+                except Exception:
+                    logging.exception(f"Falha ao editar a mensagem {message_id}.")
+                await asyncio.sleep(self.window)
+        finally:
+            if self._tasks.get(message_id) is asyncio.current_task():
+                del self._tasks[message_id]
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Edits solicitados, enviados e economizados, por tipo de mensagem."""
+        result = {}
+        for key, requested in edits_requested.values.items():
+            kind = dict(key)["kind"]
+            issued = edits_issued.get(kind=kind)
+            result[kind] = {"requested": requested, "issued": issued, "saved": requested - issued}
+        return result
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+from roster import EventRoster
+
+# --- Ator por Mensagem de Evento ---
+# Todas as alterações de um evento (inscrição, troca, adicionar/remover vaga)
+# entram numa fila e são aplicadas em ordem por um único worker, sempre sobre
+# o mesmo roster. Sem locks: só o worker toca no roster. Depois de aplicar
+# tudo o que estava na fila, o worker publica o estado mais recente uma vez.
+
+
+class EventActor:
+    """Fila de alterações de uma mensagem de evento, processada por um único worker."""
+
+    def __init__(self, message, roster: EventRoster, publish, idle_timeout: float = 300.0, on_idle=None):
+        self.message = message
+        self.roster = roster
+        # publish(message, roster, layout_changed) -> coroutine
+        self.publish = publish
+        self.idle_timeout = idle_timeout
+        self.on_idle = on_idle
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: asyncio.Task | None = None
+        # Evento encerrado: alterações ainda na fila não são mais publicadas.
+        self.closed = False
+
+    def submit(self, mutation) -> asyncio.Future:
+        """Enfileira `mutation(roster)`; o Future recebe o valor retornado por ela."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((mutation, future))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run(), name=f"event-actor-{self.message.id}")
+        return future
+
+    async def _run(self):
+        while True:
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                if self.queue.empty():
+                    break
+                continue
+
+            version = self.roster.version
+            layout_version = self.roster.layout_version
+            self._apply(*item)
+            # Aplica em lote tudo o que chegou enquanto o último edit estava em andamento.
+            while not self.queue.empty():
+                self._apply(*self.queue.get_nowait())
+
+            if self.roster.version != version and not self.closed:
+                try:
+                    await self.publish(self.message, self.roster, self.roster.layout_version != layout_version)
+                except Exception:
+                    logging.exception(f"Falha ao atualizar a mensagem do evento {self.message.id}.")
+
+        if self.on_idle:
+            self.on_idle(self)
+
+    def _apply(self, mutation, future: asyncio.Future):
+        try:
+            result = mutation(self.roster)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
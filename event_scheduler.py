@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+
+from metrics import counter, gauge
+
+# --- Agenda dos Eventos ---
+# Lembretes e encerramento automático de todos os eventos numa única fila de
+# prioridade (heap) por instante. Uma só task dorme até o próximo instante da
+# fila; agendar algo mais cedo a acorda. Cancelamentos não mexem no heap: as
+# entradas de eventos cancelados (ou reagendados) são ignoradas quando saem.
+
+REMINDER_OFFSETS = (datetime.timedelta(minutes=30), datetime.timedelta(0))
+# Lembretes atrasados (ex.: o bot estava fora do ar) só são enviados dentro desta margem.
+REMINDER_GRACE = datetime.timedelta(minutes=10)
+AUTO_CLOSE_AFTER = datetime.timedelta(hours=12)
+# Acorda pelo menos a cada minuto para acompanhar o relógio de parede.
+MAX_SLEEP = 60.0
+
+ACTION_REMINDER = "reminder"
+ACTION_CLOSE = "close"
+
+scheduled_events = gauge("scheduled_events", "Eventos com lembretes ou encerramento agendados.")
+scheduler_actions = counter("scheduler_actions_total", "Ações da agenda de eventos executadas ou puladas.")
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class ScheduledEvent:
+    """Dados de um evento que a agenda precisa para lembrar e encerrar."""
+
+    __slots__ = ("message_id", "guild_id", "channel_id", "thread_id", "starts_at", "reminders_sent")
+
+    def __init__(self, message_id: int, guild_id: int | None, channel_id: int, thread_id: int | None,
+                 starts_at: datetime.datetime, reminders_sent=()):
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.thread_id = thread_id
+        self.starts_at = starts_at
+        # Antecedências (em segundos) dos lembretes já enviados.
+        self.reminders_sent: set[int] = set(reminders_sent)
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "ScheduledEvent":
+        starts_at = doc["starts_at"]
+        if starts_at.tzinfo is None:
+            # O driver devolve datas sem fuso (em UTC).
+            starts_at = starts_at.replace(tzinfo=datetime.timezone.utc)
+        return cls(
+            message_id=doc["_id"],
+            guild_id=doc.get("guild_id"),
+            channel_id=doc["channel_id"],
+            thread_id=doc.get("thread_id"),
+            starts_at=starts_at,
+            reminders_sent=doc.get("reminders_sent", [])
+        )
+
+
+class EventScheduler:
+    """Fila de prioridade com os lembretes e encerramentos de todos os eventos."""
+
+    def __init__(self, on_reminder, on_close, reminder_offsets=REMINDER_OFFSETS,
+                 close_after: datetime.timedelta = AUTO_CLOSE_AFTER):
+        # on_reminder(evento, antecedência) e on_close(evento) -> coroutine
+        self.on_reminder = on_reminder
+        self.on_close = on_close
+        self.reminder_offsets = reminder_offsets
+        self.close_after = close_after
+        # (instante, sequência, evento, ação, antecedência)
+        self._heap: list[tuple] = []
+        self._sequence = itertools.count()
+        self.events: dict[int, ScheduledEvent] = {}
+        self._wakeup = asyncio.Event()
+        self._running: set[asyncio.Task] = set()
+        self.task: asyncio.Task | None = None
+
+    def schedule(self, event: ScheduledEvent):
+        """Agenda (ou reagenda) os lembretes e o encerramento do evento."""
+        self.events[event.message_id] = event
+        earliest = self._heap[0][0] if self._heap else None
+        for offset in self.reminder_offsets:
+            if int(offset.total_seconds()) not in event.reminders_sent:
+                self._push(event.starts_at - offset, event, ACTION_REMINDER, offset)
+        self._push(event.starts_at + self.close_after, event, ACTION_CLOSE, None)
+        scheduled_events.set(len(self.events))
+        if earliest is None or self._heap[0][0] < earliest:
+            self._wakeup.set()
+
+    def cancel(self, message_id: int):
+        if self.events.pop(message_id, None) is None:
+            return
+        scheduled_events.set(len(self.events))
+        # Muitas entradas mortas: reconstrói o heap só com as válidas.
+        if len(self._heap) > 4 * len(self.events) + 64:
+            self._heap = [entry for entry in self._heap if self.events.get(entry[2].message_id) is entry[2]]
+            heapq.heapify(self._heap)
+
+    def _push(self, when: datetime.datetime, event: ScheduledEvent, action: str, offset):
+        heapq.heappush(self._heap, (when, next(self._sequence), event, action, offset))
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run(), name="event-scheduler")
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = (self._heap[0][0] - _now()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            when, _, event, action, offset = heapq.heappop(self._heap)
+            if self.events.get(event.message_id) is not event:
+                continue  # cancelado ou reagendado
+            if action == ACTION_CLOSE:
+                self.cancel(event.message_id)
+                self._spawn(self.on_close(event), action)
+            elif _now() - when > REMINDER_GRACE:
+                scheduler_actions.inc(action="reminder_skipped")
+            else:
+                event.reminders_sent.add(int(offset.total_seconds()))
+                self._spawn(self.on_reminder(event, offset), action)
+
+    def _spawn(self, coroutine, action: str):
+        """Roda a ação sem segurar a fila (os envios ao Discord podem demorar)."""
+        scheduler_actions.inc(action=action)
+        task = asyncio.create_task(coroutine)
+        self._running.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        if not task.cancelled() and task.exception():
+            logging.error("Falha numa ação da agenda de eventos.", exc_info=task.exception())
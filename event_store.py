@@ -0,0 +1,185 @@
+import datetime
+import logging
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from event_scheduler import ScheduledEvent
+from metrics import track_mongo
+from payments import PaymentReport
+from roster import EventRoster
+
+# --- Persistência de Eventos e Pagamentos ---
+# Um documento por mensagem (o _id é o ID da mensagem no Discord). Os eventos
+# e relatórios em aberto são recarregados em lote na inicialização, para que
+# os botões continuem funcionando depois de um restart.
+
+STATUS_OPEN = "open"
+STATUS_CONCLUDED = "concluded"
+STATUS_CANCELLED = "cancelled"
+# Encerrado automaticamente pela agenda, sem ter sido concluído.
+STATUS_EXPIRED = "expired"
+
+# Relatórios de pagamento ainda em aberto, mas parados há mais tempo que isto, não
+# são recarregados na inicialização: só quando alguém clica neles.
+PAYMENT_REHYDRATE_MAX_AGE = datetime.timedelta(days=30)
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class EventStore:
+    """Estado das mensagens de evento (vagas e inscritos) no MongoDB."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        with track_mongo("create_index_events"):
+            await self.collection.create_index([("status", ASCENDING)])
+            await self.collection.create_index([("status", ASCENDING), ("starts_at", ASCENDING)])
+            # Exportação do histórico por servidor e período (export.py).
+            await self.collection.create_index([("guild_id", ASCENDING), ("created_at", ASCENDING)])
+
+    async def load_open(self, owns=None) -> dict[int, EventRoster]:
+        """Carrega os eventos em aberto numa única consulta (só dos servidores em que `owns(guild_id)`)."""
+        rosters = {}
+        with track_mongo("load_events"):
+            async for doc in self.collection.find({"status": STATUS_OPEN}):
+                if owns is None or owns(doc.get("guild_id")):
+                    rosters[doc["_id"]] = EventRoster.from_document(doc)
+        logging.info(f"{len(rosters)} evento(s) em aberto recarregado(s) do MongoDB.")
+        return rosters
+
+    async def load(self, message_id: int) -> EventRoster | None:
+        """Roster gravado de um evento, qualquer que seja o status (None se não existir)."""
+        with track_mongo("load_event"):
+            doc = await self.collection.find_one({"_id": message_id})
+        return EventRoster.from_document(doc) if doc else None
+
+    async def save(self, message, roster: EventRoster):
+        """Cria ou atualiza o documento do evento com o estado atual do roster."""
+        now = _now()
+        with track_mongo("save_event"):
+            await self.collection.update_one(
+                {"_id": message.id},
+                {
+                    "$set": {**roster.to_document(), "updated_at": now},
+                    "$setOnInsert": {
+                        "guild_id": message.guild.id if message.guild else None,
+                        "channel_id": message.channel.id,
+                        "status": STATUS_OPEN,
+                        "created_at": now,
+                    },
+                },
+                upsert=True
+            )
+
+    async def set_status(self, message_id: int, status: str):
+        with track_mongo("set_event_status"):
+            await self.collection.update_one(
+                {"_id": message_id}, {"$set": {"status": status, "updated_at": _now()}}
+            )
+
+    async def claim(self, message_id: int, status: str) -> str | None:
+        """Tira o evento de aberto (ou expirado) numa só operação e retorna o status anterior.
+
+        Entre chamadas simultâneas para o mesmo evento só uma recebe o status; as outras, None.
+        """
+        with track_mongo("claim_event"):
+            try:
+                doc = await self.collection.find_one_and_update(
+                    {"_id": message_id, "status": {"$in": [STATUS_OPEN, STATUS_EXPIRED]}},
+                    {"$set": {"status": status, "updated_at": _now()}},
+                    projection={"status": 1},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # O documento existe, mas o evento já foi concluído ou cancelado.
+                return None
+        # Sem documento (mensagem de antes da persistência): o evento estava aberto.
+        return doc["status"] if doc else STATUS_OPEN
+
+    async def get_status(self, message_id: int) -> str | None:
+        """Status gravado do evento, ou None se a mensagem nunca foi persistida."""
+        with track_mongo("get_event_status"):
+            doc = await self.collection.find_one({"_id": message_id}, {"status": 1})
+        return doc.get("status") if doc else None
+
+    async def set_schedule(self, message_id: int, starts_at: datetime.datetime, thread_id: int | None):
+        with track_mongo("set_event_schedule"):
+            await self.collection.update_one(
+                {"_id": message_id},
+                {"$set": {"starts_at": starts_at, "thread_id": thread_id, "reminders_sent": [], "updated_at": _now()}}
+            )
+
+    async def mark_reminder_sent(self, message_id: int, offset_seconds: int):
+        with track_mongo("mark_reminder_sent"):
+            await self.collection.update_one({"_id": message_id}, {"$addToSet": {"reminders_sent": offset_seconds}})
+
+    async def load_schedule(self, owns=None) -> list[ScheduledEvent]:
+        """Eventos em aberto com horário definido (só dos servidores em que `owns(guild_id)`)."""
+        events = []
+        projection = {"guild_id": 1, "channel_id": 1, "thread_id": 1, "starts_at": 1, "reminders_sent": 1}
+        with track_mongo("load_schedule"):
+            async for doc in self.collection.find({"status": STATUS_OPEN, "starts_at": {"$ne": None}}, projection):
+                if owns is None or owns(doc.get("guild_id")):
+                    events.append(ScheduledEvent.from_document(doc))
+        logging.info(f"{len(events)} evento(s) com horário reagendado(s).")
+        return events
+
+
+class PaymentStore:
+    """Estado dos relatórios de pagamento (participantes e quem já foi pago) no MongoDB."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        with track_mongo("create_index_payments"):
+            await self.collection.create_index([("status", ASCENDING)])
+            await self.collection.create_index([("status", ASCENDING), ("updated_at", ASCENDING)])
+
+    async def load_open(self, owns=None) -> dict[int, PaymentReport]:
+        """Relatórios com alguém ainda sem pagamento e movimentados recentemente."""
+        reports = {}
+        since = _now() - PAYMENT_REHYDRATE_MAX_AGE
+        with track_mongo("load_payments"):
+            async for doc in self.collection.find({"status": STATUS_OPEN, "updated_at": {"$gte": since}}):
+                if owns is None or owns(doc.get("guild_id")):
+                    reports[doc["_id"]] = PaymentReport.from_document(doc)
+        logging.info(f"{len(reports)} relatório(s) de pagamento recarregado(s) do MongoDB.")
+        return reports
+
+    async def load(self, message_id: int) -> PaymentReport | None:
+        """Relatório gravado, qualquer que seja o status (None se não existir)."""
+        with track_mongo("load_payment"):
+            doc = await self.collection.find_one({"_id": message_id})
+        return PaymentReport.from_document(doc) if doc else None
+
+    async def create(self, message, report: PaymentReport, event_id: int):
+        now = _now()
+        with track_mongo("create_payment"):
+            await self.collection.insert_one({
+                "_id": message.id,
+                "guild_id": message.guild.id if message.guild else None,
+                "channel_id": message.channel.id,
+                "event_id": event_id,
+                "status": STATUS_OPEN,
+                "created_at": now,
+                "updated_at": now,
+                **report.to_document(),
+            })
+
+    async def set_paid(self, message_id: int, user_id: int, paid: bool, settled: bool):
+        """Atualiza atomicamente só o participante alterado.
+
+        Com todos pagos (`settled`), o relatório sai de aberto e deixa de ser recarregado na inicialização.
+        """
+        status = STATUS_CONCLUDED if settled else STATUS_OPEN
+        with track_mongo("set_paid"):
+            await self.collection.update_one(
+                {"_id": message_id, "participants.user_id": user_id},
+                {"$set": {"participants.$.paid": paid, "status": status, "updated_at": _now()}}
+            )
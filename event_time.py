@@ -0,0 +1,124 @@
+import datetime
+import re
+import unicodedata
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# --- Horário dos Eventos ---
+# Converte o texto livre do campo `horario` num instante (UTC). Aceita, em
+# qualquer ordem: um horário ("21:00", "21h", "21h30"), opcionalmente com uma
+# data ("25/10", "25/10/2026", "2026-10-25"), "hoje", "amanhã" ou um dia da
+# semana ("sábado 20h"), ou um timestamp do Discord ("<t:1700000000:F>").
+# Sem data, vale a próxima ocorrência do horário (um horário que passou há
+# pouco ainda é o de hoje). O fuso vem das configurações do servidor; "UTC" no
+# texto força UTC (o horário do jogo no Albion) e "UTC-3" um deslocamento fixo.
+# Se sobrar alguma parte que não foi reconhecida ("dia 25 às 21h"), o horário
+# fica só como texto: é melhor não agendar do que agendar no dia errado.
+
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+# Um evento criado em cima da hora ainda vale; um horário mais antigo que isso
+# já passou (ou foi digitado errado).
+PAST_START_TOLERANCE = datetime.timedelta(minutes=10)
+
+DISCORD_TIMESTAMP_PATTERN = re.compile(r"<t:(-?\d+)(?::[tTdDfFR])?>")
+DATE_PATTERN = re.compile(r"(?<!\d)(?:(\d{4})-(\d{1,2})-(\d{1,2})|(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?)(?!\d)")
+TIME_PATTERN = re.compile(r"(?<!\d)(\d{1,2})\s*(?::(\d{2})\s*h?|h(?:oras|rs|s)?\s*(\d{2})?)(?!\d)")
+UTC_PATTERN = re.compile(r"(?<![a-z])utc(?:\s*([+\-−])\s*(\d{1,2})(?::?(\d{2}))?)?(?![a-z\d])")
+WORD_PATTERN = re.compile(r"[a-z]+")
+MAX_UTC_OFFSET = datetime.timedelta(hours=14)
+
+# Sem acentos (o texto é normalizado antes da busca).
+WEEKDAYS = {
+    "seg": 0, "segunda": 0, "ter": 1, "terca": 1, "qua": 2, "quarta": 2, "qui": 3, "quinta": 3,
+    "sex": 4, "sexta": 4, "sab": 5, "sabado": 5, "dom": 6, "domingo": 6,
+}
+# Palavras que podem acompanhar o horário sem mudar o sentido ("sábado às 20h").
+FILLER_WORDS = {"a", "as", "de", "do", "da", "em", "no", "na", "dia", "feira", "proximo", "proxima"}
+KNOWN_WORDS = {"hoje", "amanha"} | set(WEEKDAYS) | FILLER_WORDS
+
+
+def resolve_timezone(name: str | None) -> ZoneInfo | None:
+    """ZoneInfo do nome IANA (ex.: "America/Sao_Paulo"), ou None se não existir."""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def _cut(text: str, match: re.Match) -> str:
+    return text[:match.start()] + " " + text[match.end():]
+
+
+def parse_event_time(text: str, timezone: datetime.tzinfo, now: datetime.datetime = None) -> datetime.datetime | None:
+    """Instante (com fuso UTC) descrito em `text`, ou None se não houver um horário reconhecível."""
+    if not text:
+        return None
+    match = DISCORD_TIMESTAMP_PATTERN.search(text)
+    if match:
+        return datetime.datetime.fromtimestamp(int(match.group(1)), datetime.timezone.utc)
+
+    normalized = _strip_accents(text.lower())
+    utc_match = UTC_PATTERN.search(normalized)
+    if utc_match:
+        sign, hours, minutes = utc_match.groups()
+        offset = datetime.timedelta(hours=int(hours or 0), minutes=int(minutes or 0))
+        if offset > MAX_UTC_OFFSET:
+            return None
+        timezone = datetime.timezone(offset if sign in (None, "+") else -offset)
+        # Tira o fuso para que o "3" de "UTC-3:00" não seja lido como horário.
+        normalized = _cut(normalized, utc_match)
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(timezone)
+
+    date_match = DATE_PATTERN.search(normalized)
+    if date_match:
+        # Tira a data para que "25/10" não seja confundido com um horário.
+        normalized = _cut(normalized, date_match)
+    time_match = TIME_PATTERN.search(normalized)
+    if not time_match:
+        return None
+    rest = _cut(normalized, time_match)
+    words = set(WORD_PATTERN.findall(rest))
+    if re.search(r"\d", rest) or not words <= KNOWN_WORDS:
+        # Sobrou um número ou uma palavra desconhecida: não dá para confiar no resultado.
+        return None
+    hour = int(time_match.group(1))
+    minute = int(time_match.group(2) or time_match.group(3) or 0)
+    if hour > 23 or minute > 59:
+        return None
+    at = datetime.time(hour, minute)
+
+    try:
+        if date_match:
+            iso_year, iso_month, iso_day, day, month, year = date_match.groups()
+            if iso_year:
+                date = datetime.date(int(iso_year), int(iso_month), int(iso_day))
+            else:
+                explicit_year = int(year) + (2000 if year and len(year) == 2 else 0) if year else now.year
+                date = datetime.date(explicit_year, int(month), int(day))
+                if not year and datetime.datetime.combine(date, at, timezone) < now - datetime.timedelta(days=1):
+                    # "05/01" digitado em dezembro: é o ano que vem.
+                    date = date.replace(year=date.year + 1)
+            return datetime.datetime.combine(date, at, timezone).astimezone(datetime.timezone.utc)
+    except ValueError:
+        return None
+
+    today = now.date()
+    if "amanha" in words:
+        date = today + datetime.timedelta(days=1)
+    elif "hoje" in words:
+        date = today
+    else:
+        weekday = next((WEEKDAYS[word] for word in words if word in WEEKDAYS), None)
+        if weekday is not None:
+            date = today + datetime.timedelta(days=(weekday - today.weekday()) % 7)
+        else:
+            date = today
+        if datetime.datetime.combine(date, at, timezone) < now - PAST_START_TOLERANCE:
+            # O horário de hoje já passou (não só por alguns minutos): próxima ocorrência.
+            date += datetime.timedelta(days=7 if weekday is not None else 1)
+    return datetime.datetime.combine(date, at, timezone).astimezone(datetime.timezone.utc)
@@ -0,0 +1,184 @@
+"""Exporta o histórico de eventos, inscrições e pagamentos do MongoDB em CSV ou NDJSON.
+
+Os documentos são lidos com um cursor em lotes (--batch-size) e cada linha é
+escrita no arquivo assim que chega: a memória usada não cresce com o tamanho do
+histórico. Os filtros de servidor e de data vão para a consulta e usam os
+índices (guild_id, created_at) dos eventos e (guild_id, date) do livro-caixa.
+
+Uso: MONGO_URI=... python export.py pagamentos --guild 123 --desde 2026-01-01 --ate 2026-03-31 --saida temporada.csv
+"""
+import argparse
+import asyncio
+import csv
+import datetime
+import json
+import os
+import sys
+
+from metrics import track_mongo
+
+EXPORT_BATCH_SIZE = 500
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_KINDS = {
+    # tipo -> colunas, na ordem do arquivo
+    "eventos": ("event_id", "guild_id", "channel_id", "title", "status", "created_at", "starts_at",
+                "author_id", "slots", "participants"),
+    "inscricoes": ("event_id", "guild_id", "title", "status", "created_at", "slot", "user_id"),
+    "pagamentos": ("report_id", "event_id", "guild_id", "date", "title", "user_id",
+                   "loot", "repair", "amount", "paid"),
+}
+DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d")
+
+
+def parse_export_date(text: str) -> datetime.date:
+    """Data de um filtro ("31/12/2026", "31/12/26" ou "2026-12-31"); ValueError se inválida."""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text.strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {text!r}. Use DD/MM/AAAA ou AAAA-MM-DD.")
+
+
+def date_range(since: datetime.date | None, until: datetime.date | None, timezone: datetime.tzinfo):
+    """Início (inclusivo) e fim (exclusivo) em UTC dos dias informados, no fuso do servidor."""
+    def start_of(day: datetime.date) -> datetime.datetime:
+        return datetime.datetime.combine(day, datetime.time(), timezone).astimezone(datetime.timezone.utc)
+
+    start = start_of(since) if since else None
+    end = start_of(until + datetime.timedelta(days=1)) if until else None
+    return start, end
+
+
+def _event_title(title: str | None) -> str:
+    return (title or "").replace("📢 Evento: ", "")
+
+
+def _cell(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            # O driver devolve datas sem fuso (em UTC).
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.isoformat()
+    return value
+
+
+class HistoryExporter:
+    """Lê o histórico com cursores em lote e escreve linha a linha."""
+
+    def __init__(self, events_collection, ledger_collection, batch_size: int = EXPORT_BATCH_SIZE):
+        self.events = events_collection
+        self.ledger = ledger_collection
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _query(date_field: str, guild_id: int | None, start, end) -> dict:
+        query = {}
+        if guild_id is not None:
+            query["guild_id"] = guild_id
+        if start is not None or end is not None:
+            query[date_field] = {}
+            if start is not None:
+                query[date_field]["$gte"] = start
+            if end is not None:
+                query[date_field]["$lt"] = end
+        return query
+
+    async def rows(self, kind: str, guild_id: int = None, start: datetime.datetime = None,
+                   end: datetime.datetime = None):
+        """Linhas (dicts) do tipo pedido, em ordem cronológica."""
+        if kind == "pagamentos":
+            query = self._query("date", guild_id, start, end)
+            projection = {column: 1 for column in EXPORT_KINDS[kind]}
+            with track_mongo("export_payouts"):
+                cursor = self.ledger.find(query, projection, batch_size=self.batch_size).sort("date", 1)
+                async for doc in cursor:
+                    yield {**doc, "title": _event_title(doc.get("title"))}
+            return
+
+        query = self._query("created_at", guild_id, start, end)
+        projection = {"guild_id": 1, "channel_id": 1, "title": 1, "status": 1, "created_at": 1,
+                      "starts_at": 1, "author_id": 1, "slots": 1}
+        with track_mongo("export_events"):
+            cursor = self.events.find(query, projection, batch_size=self.batch_size).sort("created_at", 1)
+            async for doc in cursor:
+                event = {
+                    "event_id": doc["_id"],
+                    "guild_id": doc.get("guild_id"),
+                    "title": _event_title(doc.get("title")),
+                    "status": doc.get("status"),
+                    "created_at": doc.get("created_at"),
+                }
+                slots = doc.get("slots", [])
+                if kind == "eventos":
+                    yield {
+                        **event,
+                        "channel_id": doc.get("channel_id"),
+                        "starts_at": doc.get("starts_at"),
+                        "author_id": doc.get("author_id"),
+                        "slots": len(slots),
+                        "participants": sum(len(slot.get("user_ids", [])) for slot in slots),
+                    }
+                else:
+                    for slot in slots:
+                        for user_id in slot.get("user_ids", []):
+                            yield {**event, "slot": slot["name"], "user_id": user_id}
+
+    async def write(self, kind: str, output_format: str, file, guild_id: int = None,
+                    start: datetime.datetime = None, end: datetime.datetime = None) -> int:
+        """Escreve as linhas em `file` (texto, aberto com newline=""); retorna quantas foram escritas."""
+        if kind not in EXPORT_KINDS:
+            raise ValueError(f"Tipo de exportação desconhecido: {kind}")
+        if output_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato desconhecido: {output_format}")
+        columns = EXPORT_KINDS[kind]
+        if output_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(columns)
+
+            def write_row(row):
+                writer.writerow([_cell(row.get(column)) for column in columns])
+        else:
+            def write_row(row):
+                file.write(json.dumps({column: _cell(row.get(column)) for column in columns}, ensure_ascii=False) + "\n")
+
+        count = 0
+        async for row in self.rows(kind, guild_id, start, end):
+            write_row(row)
+            count += 1
+        return count
+
+
+async def run(args) -> int:
+    from pymongo import AsyncMongoClient
+    import certifi
+
+    start, end = date_range(args.desde, args.ate, datetime.timezone.utc)
+    client = AsyncMongoClient(os.environ["MONGO_URI"], tlsCAFile=certifi.where())
+    db = client.get_database("discord_bot_db")
+    exporter = HistoryExporter(db.get_collection("events"), db.get_collection("payout_ledger"), args.batch_size)
+    try:
+        if args.saida == "-":
+            return await exporter.write(args.tipo, args.formato, sys.stdout, args.guild, start, end)
+        with open(args.saida, "w", newline="", encoding="utf-8") as file:
+            return await exporter.write(args.tipo, args.formato, file, args.guild, start, end)
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tipo", choices=EXPORT_KINDS)
+    parser.add_argument("--formato", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--guild", type=int, help="ID do servidor (sem ele, exporta todos).")
+    parser.add_argument("--desde", type=parse_export_date, help="Primeiro dia (UTC), inclusivo.")
+    parser.add_argument("--ate", type=parse_export_date, help="Último dia (UTC), inclusivo.")
+    parser.add_argument("--saida", default="-", help="Arquivo de saída ('-' para a saída padrão).")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Documentos por lote do cursor.")
+    args = parser.parse_args()
+
+    if not os.getenv("MONGO_URI"):
+        print("ERRO: defina MONGO_URI.", file=sys.stderr)
+        sys.exit(1)
+    count = asyncio.run(run(args))
+    print(f"{count} linha(s) exportada(s).", file=sys.stderr)
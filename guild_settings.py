@@ -0,0 +1,109 @@
+import asyncio
+import datetime
+import logging
+
+from metrics import track_mongo
+
+# --- Configurações por Servidor ---
+# Um documento por servidor, com _id = guild_id: a busca usa o índice primário.
+# As configurações ficam em cache depois da primeira leitura. Como cada servidor
+# é atendido por um único processo (o dono do seu shard), só ele escreve nas
+# configurações do servidor e o cache não fica desatualizado.
+
+
+class GuildSettings:
+    """Configurações de um servidor; campos None usam o padrão do bot."""
+
+    __slots__ = ("guild_id", "report_channel_id", "default_template", "default_description", "timezone")
+
+    def __init__(self, guild_id: int, report_channel_id: int = None, default_template: str = None,
+                 default_description: str = None, timezone: str = None):
+        self.guild_id = guild_id
+        self.report_channel_id = report_channel_id
+        self.default_template = default_template
+        self.default_description = default_description
+        # Nome IANA do fuso usado para interpretar o horário dos eventos.
+        self.timezone = timezone
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "GuildSettings":
+        return cls(
+            guild_id=doc["_id"],
+            report_channel_id=doc.get("report_channel_id"),
+            default_template=doc.get("default_template"),
+            default_description=doc.get("default_description"),
+            timezone=doc.get("timezone")
+        )
+
+    def to_document(self) -> dict:
+        return {
+            "report_channel_id": self.report_channel_id,
+            "default_template": self.default_template,
+            "default_description": self.default_description,
+            "timezone": self.timezone,
+        }
+
+
+class GuildSettingsStore:
+    """Cache das configurações por servidor, com escrita direta (write-through) no MongoDB."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.cache: dict[int, GuildSettings] = {}
+        # Cargas em segundo plano em andamento (ver cached).
+        self._loading: dict[int, asyncio.Task] = {}
+
+    async def get(self, guild_id: int) -> GuildSettings:
+        settings = self.cache.get(guild_id)
+        if settings is None:
+            with track_mongo("load_guild_settings"):
+                doc = await self.collection.find_one({"_id": guild_id})
+            # Servidores sem documento também ficam em cache (com os padrões).
+            settings = self.cache[guild_id] = GuildSettings.from_document(doc) if doc else GuildSettings(guild_id)
+        return settings
+
+    def cached(self, guild_id: int) -> GuildSettings:
+        """Configurações sem esperar o banco: numa falta de cache, os padrões (e a carga fica em segundo plano)."""
+        settings = self.cache.get(guild_id)
+        if settings is not None:
+            return settings
+        if guild_id not in self._loading:
+            self._loading[guild_id] = asyncio.create_task(self._load_in_background(guild_id), name=f"guild-settings-{guild_id}")
+        return GuildSettings(guild_id)
+
+    async def _load_in_background(self, guild_id: int):
+        try:
+            await self.get(guild_id)
+        except Exception:
+            logging.exception(f"Falha ao carregar as configurações do servidor {guild_id}.")
+        finally:
+            self._loading.pop(guild_id, None)
+
+    async def preload(self, guild_ids) -> int:
+        """Carrega de uma vez as configurações dos servidores informados (ex.: os deste shard)."""
+        guild_ids = [guild_id for guild_id in guild_ids if guild_id not in self.cache]
+        if not guild_ids:
+            return 0
+        loaded = {}
+        with track_mongo("preload_guild_settings"):
+            async for doc in self.collection.find({"_id": {"$in": guild_ids}}):
+                loaded[doc["_id"]] = GuildSettings.from_document(doc)
+        for guild_id in guild_ids:
+            self.cache.setdefault(guild_id, loaded.get(guild_id) or GuildSettings(guild_id))
+        return len(loaded)
+
+    async def update(self, guild_id: int, **fields) -> GuildSettings:
+        """Altera só os campos informados; o cache é atualizado depois da escrita confirmada."""
+        settings = await self.get(guild_id)
+        for name in fields:
+            if name not in GuildSettings.__slots__ or name == "guild_id":
+                raise ValueError(f"Configuração desconhecida: {name}")
+        with track_mongo("save_guild_settings"):
+            await self.collection.update_one(
+                {"_id": guild_id},
+                {"$set": {**fields, "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+                upsert=True
+            )
+        for name, value in fields.items():
+            setattr(settings, name, value)
+        return settings
@@ -0,0 +1,148 @@
+import asyncio
+import collections
+import logging
+import time
+
+from metrics import counter, gauge, histogram
+
+# --- Fila de Trabalho em Segundo Plano ---
+# Os handlers respondem à interação primeiro e entregam os passos lentos
+# (criar tópico, editar mensagens, gravar no banco) para esta fila.
+#
+# - Limitada: com `max_pending` jobs na fila, quem enfileira espera uma vaga
+#   (backpressure) em vez de acumular trabalho sem limite.
+# - Justa entre servidores: cada servidor tem a sua fila e os workers alternam
+#   entre eles (round-robin), então um servidor com muitos eventos não atrasa os outros.
+# - Com novas tentativas: falhas transitórias (`retry_on`) voltam para a fila
+#   com espera exponencial, até `max_attempts` tentativas.
+
+jobs_submitted = counter("jobs_submitted_total", "Jobs enfileirados, por nome.")
+jobs_completed = counter("jobs_completed_total", "Jobs concluídos, por nome.")
+jobs_retried = counter("jobs_retried_total", "Novas tentativas de jobs, por nome.")
+jobs_failed = counter("jobs_failed_total", "Jobs que falharam em definitivo, por nome.")
+jobs_pending = gauge("jobs_pending", "Jobs na fila ou em execução.")
+job_wait = histogram("job_queue_wait_seconds", "Tempo entre enfileirar (ou reenfileirar) um job e ele começar a rodar.")
+job_duration = histogram("job_duration_seconds", "Duração de cada tentativa de um job.")
+backpressure_wait = histogram("job_queue_backpressure_seconds", "Tempo esperando vaga numa fila cheia.")
+
+
+class Job:
+    __slots__ = ("guild_id", "name", "func", "args", "future", "attempts", "enqueued_at")
+
+    def __init__(self, guild_id, name: str, func, args: tuple):
+        self.guild_id = guild_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.future = asyncio.get_running_loop().create_future()
+        self.attempts = 0
+        self.enqueued_at = time.perf_counter()
+
+
+def _retrieve(future: asyncio.Future):
+    # Quem não espera pelo resultado não precisa ver "exception was never retrieved".
+    if not future.cancelled():
+        future.exception()
+
+
+class JobQueue:
+    """Fila de jobs assíncronos com limite, justiça por servidor e novas tentativas."""
+
+    def __init__(self, workers: int = 8, max_pending: int = 500, max_attempts: int = 3,
+                 retry_delay: float = 1.0, retry_on=None):
+        self.worker_count = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # retry_on(exceção) -> bool; por padrão não tenta de novo.
+        self.retry_on = retry_on or (lambda error: False)
+        self._slots = asyncio.Semaphore(max_pending)
+        # guild_id -> jobs prontos daquele servidor
+        self._guild_jobs: dict[int | None, collections.deque] = {}
+        # Servidores com jobs prontos, na ordem em que serão atendidos.
+        self._ring: asyncio.Queue = asyncio.Queue()
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: list[asyncio.Task] = []
+
+    def start(self):
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.worker_count)
+            ]
+
+    async def submit(self, guild_id: int | None, name: str, func, *args) -> asyncio.Future:
+        """Enfileira `func(*args)` (uma função async); espera vaga se a fila estiver cheia.
+
+        A função é chamada de novo a cada tentativa, então ela deve poder ser repetida.
+        """
+        if self._slots.locked():
+            start = time.perf_counter()
+            await self._slots.acquire()
+            backpressure_wait.observe(time.perf_counter() - start)
+        else:
+            await self._slots.acquire()
+        job = Job(guild_id, name, func, args)
+        job.future.add_done_callback(_retrieve)
+        self._pending += 1
+        self._idle.clear()
+        jobs_pending.set(self._pending)
+        jobs_submitted.inc(name=name)
+        self._enqueue(job)
+        return job.future
+
+    async def join(self):
+        """Espera até não haver nenhum job na fila nem em execução."""
+        await self._idle.wait()
+
+    def _enqueue(self, job: Job):
+        job.enqueued_at = time.perf_counter()
+        jobs = self._guild_jobs.get(job.guild_id)
+        if jobs is None:
+            jobs = self._guild_jobs[job.guild_id] = collections.deque()
+            self._ring.put_nowait(job.guild_id)
+        jobs.append(job)
+
+    async def _work(self):
+        while True:
+            guild_id = await self._ring.get()
+            jobs = self._guild_jobs[guild_id]
+            job = jobs.popleft()
+            if jobs:
+                # Ainda há jobs deste servidor: ele volta para o fim da fila.
+                self._ring.put_nowait(guild_id)
+            else:
+                del self._guild_jobs[guild_id]
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        job_wait.observe(time.perf_counter() - job.enqueued_at, name=job.name)
+        job.attempts += 1
+        start = time.perf_counter()
+        try:
+            result = await job.func(*job.args)
+        except Exception as error:
+            job_duration.observe(time.perf_counter() - start, name=job.name)
+            if job.attempts < self.max_attempts and self.retry_on(error):
+                jobs_retried.inc(name=job.name)
+                delay = self.retry_delay * 2 ** (job.attempts - 1)
+                logging.warning(f"Job {job.name} falhou ({error!r}); tentativa {job.attempts + 1} em {delay:.1f}s.")
+                asyncio.get_running_loop().call_later(delay, self._enqueue, job)
+                return
+            jobs_failed.inc(name=job.name)
+            logging.error(f"Job {job.name} falhou em definitivo após {job.attempts} tentativa(s).", exc_info=error)
+            if not job.future.done():
+                job.future.set_exception(error)
+        else:
+            job_duration.observe(time.perf_counter() - start, name=job.name)
+            jobs_completed.inc(name=job.name)
+            if not job.future.done():
+                job.future.set_result(result)
+        self._finish()
+
+    def _finish(self):
+        self._pending -= 1
+        jobs_pending.set(self._pending)
+        self._slots.release()
+        if self._pending == 0:
+            self._idle.set()
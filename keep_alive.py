@@ -1,16 +1,111 @@
-from flask import Flask
-from waitress import serve
-from threading import Thread
+import asyncio
+import json
+import time
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def home():
-    return "Estou vivo!"
+from metrics import gauge, histogram, render_prometheus
 
-def run():
-    serve(app, host="0.0.0.0", port=8080)
+# --- Endpoint de Saúde e Métricas ---
+# Roda no próprio loop do bot (aiohttp já vem com o discord.py), então se o loop
+# travar o endpoint também para de responder. Rotas:
+#   /         -> "Estou vivo!" (compatível com o keep-alive antigo)
+#   /health   -> JSON com a conexão e a latência de cada shard, lag do loop e caches;
+#                503 se algum shard estiver desconectado ou o loop travado
+#   /metrics  -> métricas no formato do Prometheus
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+loop_lag = histogram("event_loop_lag_seconds", "Atraso do event loop em relação ao agendado.",
+                     buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+loop_lag_last = gauge("event_loop_lag_last_seconds", "Última medição do atraso do event loop.")
+gateway_latency = gauge("gateway_latency_seconds", "Latência do heartbeat do gateway do Discord, por shard.")
+gateway_connected = gauge("gateway_connected", "1 se o shard está conectado ao gateway, por shard.")
+
+MAX_HEALTHY_LOOP_LAG = 1.0
+
+
+class LoopLagMonitor:
+    """Acorda a cada `interval` segundos e mede quanto o loop atrasou para acordá-lo."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.last_beat = time.monotonic()
+        self.task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - scheduled, 0.0)
+            self.last_lag = lag
+            self.last_beat = time.monotonic()
+            loop_lag.observe(lag)
+            loop_lag_last.set(lag)
+
+
+def _shard_status(bot) -> dict[int, dict]:
+    """Conexão e latência de cada shard deste processo, vistas no websocket de cada um.
+
+    `bot.is_ready()` não serve: o discord.py só o desfaz no `close()`, então ele
+    continua verdadeiro enquanto um shard cai e reconecta.
+    """
+    shards = {}
+    for shard_id, shard in bot.shards.items():
+        connected = not shard.is_closed()
+        latency = shard.latency if connected else None
+        shards[shard_id] = {
+            "connected": connected,
+            "latency_seconds": latency if latency == latency else None,  # NaN antes do 1º heartbeat
+        }
+    return shards
+
+
+def _health(bot, monitor: LoopLagMonitor, ready_check) -> tuple[bool, dict]:
+    shards = _shard_status(bot)
+    connected = bool(shards) and all(shard["connected"] for shard in shards.values())
+    # Batimento atrasado = o loop ficou preso por mais tempo do que o lag medido mostra.
+    beat_age = time.monotonic() - monitor.last_beat
+    loop_responsive = monitor.last_lag < MAX_HEALTHY_LOOP_LAG and beat_age < monitor.interval + MAX_HEALTHY_LOOP_LAG
+    status = {
+        "gateway_connected": connected,
+        "shards": {str(shard_id): shard for shard_id, shard in shards.items()},
+        "loop_lag_seconds": monitor.last_lag,
+        "loop_responsive": loop_responsive,
+        "caches_ready": ready_check(),
+    }
+    return connected and loop_responsive, status
+
+
+async def keep_alive(bot, ready_check=lambda: True, host: str = "0.0.0.0", port: int = 8080) -> web.AppRunner:
+    """Inicia o servidor HTTP de saúde/métricas no loop atual e o monitor de lag do loop."""
+    monitor = LoopLagMonitor()
+    monitor.task = asyncio.create_task(monitor.run(), name="loop-lag-monitor")
+
+    async def home(request):
+        return web.Response(text="Estou vivo!")
+
+    async def health(request):
+        healthy, status = _health(bot, monitor, ready_check)
+        return web.Response(
+            text=json.dumps(status),
+            content_type="application/json",
+            status=200 if healthy else 503
+        )
+
+    async def metrics(request):
+        for shard_id, shard in _shard_status(bot).items():
+            gateway_connected.set(1 if shard["connected"] else 0, shard=str(shard_id))
+            if shard["latency_seconds"] is not None:
+                gateway_latency.set(shard["latency_seconds"], shard=str(shard_id))
+        return web.Response(
+            body=render_prometheus().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+
+    app = web.Application()
+    app.add_routes([web.get("/", home), web.get("/health", health), web.get("/metrics", metrics)])
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
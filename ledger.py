@@ -0,0 +1,102 @@
+import datetime
+
+from pymongo import ASCENDING, DESCENDING
+
+from metrics import track_mongo
+
+# --- Livro-Caixa de Pagamentos ---
+# Uma entrada por (relatório, jogador) de cada evento concluído. Saldos e
+# totais são calculados pelo próprio MongoDB (aggregate), usando os índices
+# por (guild_id, user_id) e (guild_id, date), então as consultas continuam
+# rápidas mesmo com dezenas de milhares de eventos.
+
+
+class PayoutLedger:
+    """Entradas de pagamento por jogador, com consultas de saldo e totais por servidor."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        with track_mongo("create_index_ledger"):
+            await self.collection.create_index([("guild_id", ASCENDING), ("user_id", ASCENDING)])
+            await self.collection.create_index([("guild_id", ASCENDING), ("date", DESCENDING)])
+            await self.collection.create_index([("report_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+
+    async def record_report(self, guild_id: int, report_id: int, event_id: int, title: str,
+                            participant_ids: list[int], loot_per_person: int, repair_per_person: int):
+        """Registra uma entrada (ainda não paga) para cada participante do evento."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        entries = [
+            {
+                "guild_id": guild_id,
+                "user_id": user_id,
+                "report_id": report_id,
+                "event_id": event_id,
+                "title": title,
+                "date": now,
+                "loot": loot_per_person,
+                "repair": repair_per_person,
+                "amount": loot_per_person - repair_per_person,
+                "paid": False,
+            }
+            for user_id in participant_ids
+        ]
+        if entries:
+            with track_mongo("record_payouts"):
+                await self.collection.insert_many(entries, ordered=False)
+
+    async def set_paid(self, report_id: int, user_id: int, paid: bool):
+        with track_mongo("set_payout_paid"):
+            await self.collection.update_one({"report_id": report_id, "user_id": user_id}, {"$set": {"paid": paid}})
+
+    async def player_balance(self, guild_id: int, user_id: int) -> dict:
+        """Total a receber, total já pago e número de eventos de um jogador."""
+        pipeline = [
+            {"$match": {"guild_id": guild_id, "user_id": user_id}},
+            {"$group": {
+                "_id": None,
+                "outstanding": {"$sum": {"$cond": ["$paid", 0, "$amount"]}},
+                "paid": {"$sum": {"$cond": ["$paid", "$amount", 0]}},
+                "events": {"$sum": 1},
+            }},
+        ]
+        with track_mongo("player_balance"):
+            results = await (await self.collection.aggregate(pipeline)).to_list(length=1)
+        return results[0] if results else {"outstanding": 0, "paid": 0, "events": 0}
+
+    async def guild_totals(self, guild_id: int, since: datetime.datetime = None, top: int = 10) -> dict:
+        """Totais do servidor (opcionalmente a partir de uma data) e os maiores saldos em aberto."""
+        match = {"guild_id": guild_id}
+        if since is not None:
+            match["date"] = {"$gte": since}
+        pipeline = [
+            {"$match": match},
+            {"$facet": {
+                "totals": [{"$group": {
+                    "_id": None,
+                    "total": {"$sum": "$amount"},
+                    "outstanding": {"$sum": {"$cond": ["$paid", 0, "$amount"]}},
+                    "entries": {"$sum": 1},
+                }}],
+                "reports": [{"$group": {"_id": "$report_id"}}, {"$count": "count"}],
+                "top_outstanding": [
+                    {"$match": {"paid": False}},
+                    {"$group": {"_id": "$user_id", "outstanding": {"$sum": "$amount"}}},
+                    {"$sort": {"outstanding": -1}},
+                    {"$limit": top},
+                ],
+            }},
+        ]
+        with track_mongo("guild_totals"):
+            results = await (await self.collection.aggregate(pipeline)).to_list(length=1)
+        facet = results[0] if results else {}
+        totals = (facet.get("totals") or [{}])[0]
+        reports = (facet.get("reports") or [{}])[0]
+        return {
+            "total": totals.get("total", 0),
+            "outstanding": totals.get("outstanding", 0),
+            "entries": totals.get("entries", 0),
+            "events": reports.get("count", 0),
+            "top_outstanding": [(row["_id"], row["outstanding"]) for row in facet.get("top_outstanding", [])],
+        }
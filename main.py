@@ -1,14 +1,42 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 from discord.ui import Button, View, Modal, TextInput
 import os
+import asyncio
+import functools
+import tempfile
+import datetime
+import time
 from keep_alive import keep_alive
 import logging
 import traceback
 import sys
-import pymongo
+from pymongo import AsyncMongoClient
+from pymongo.errors import ConnectionFailure
+import aiohttp
 import certifi
 import re # Usado para limpar os emojis
+from template_store import TemplateStore
+from template_watcher import TemplateWatcher
+from roster import EventRoster, add_compact_fields, parse_slot_spec
+from event_actor import EventActor
+from edit_coalescer import EditCoalescer
+from job_queue import JobQueue
+from outbound import OutboundScheduler, PRIORITY_NORMAL, mark_user_facing, priority, user_facing
+from event_store import EventStore, PaymentStore, STATUS_CANCELLED, STATUS_CONCLUDED, STATUS_EXPIRED, STATUS_OPEN
+from event_scheduler import EventScheduler, ScheduledEvent
+from event_time import DEFAULT_TIMEZONE, PAST_START_TOLERANCE, parse_event_time, resolve_timezone
+from export import HistoryExporter, date_range, parse_export_date
+from payments import PaymentReport
+from ledger import PayoutLedger
+from member_names import DisplayNameResolver
+from startup import StartupTimer, sync_commands_if_changed
+from guild_settings import GuildSettings, GuildSettingsStore
+from sharding import ShardConfig
+from metrics import handler_errors, handler_latency, timed_handler
+
+startup_timer = StartupTimer()
 
 # --- Configuração do Banco de Dados MongoDB ---
 try:
@@ -17,16 +45,20 @@ try:
         print("ERRO CRÍTICO: MONGO_URI não encontrada nas variáveis de ambiente.", file=sys.stderr)
         sys.exit(1)
         
-    client = pymongo.MongoClient(mongo_uri, tlsCAFile=certifi.where())
+    # O driver assíncrono não bloqueia o loop do bot. connect=False: nenhuma conexão é
+    # aberta aqui; ela acontece em segundo plano, depois que o bot já está no gateway.
+    client = AsyncMongoClient(mongo_uri, tlsCAFile=certifi.where(), connect=False)
     
     db = client.get_database("discord_bot_db")
-    templates_collection = db.get_collection("templates")
-    
-    client.admin.command('ping')
-    
-    print("Conectado ao MongoDB com sucesso!")
+    templates_collection = db.get_collection("guild_templates")
+    legacy_templates_collection = db.get_collection("templates")
+    events_collection = db.get_collection("events")
+    payments_collection = db.get_collection("payments")
+    ledger_collection = db.get_collection("payout_ledger")
+    meta_collection = db.get_collection("bot_meta")
+    settings_collection = db.get_collection("guild_settings")
 except Exception as e:
-    print(f"ERRO CRÍTICO: Falha ao conectar ao MongoDB: {e}", file=sys.stderr)
+    print(f"ERRO CRÍTICO: Falha ao configurar o MongoDB: {e}", file=sys.stderr)
     sys.exit(1)
 
 # --- Configuração de Log ---
@@ -37,7 +69,53 @@ intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+# LOW_MEMORY_MEMBERS=1: não baixa a lista de membros dos servidores ao conectar e
+# não guarda membros em cache. Os nomes são resolvidos sob demanda (DisplayNameResolver),
+# o que reduz bastante o uso de memória em servidores grandes.
+low_memory_members = os.getenv("LOW_MEMORY_MEMBERS") == "1"
+member_cache_options = {}
+if low_memory_members:
+    member_cache_options = {"chunk_guilds_at_startup": False, "member_cache_flags": discord.MemberCacheFlags.none()}
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """Árvore de comandos que mede a latência de cada comando de barra."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.perf_counter()
+        # As chamadas ao Discord feitas pelo comando passam na frente dos edits em segundo plano.
+        mark_user_facing()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        observe_command_latency(interaction, failed=True)
+        await super().on_error(interaction, error)
+
+def observe_command_latency(interaction: discord.Interaction, failed: bool = False):
+    started_at = interaction.extras.get("started_at")
+    name = interaction.command.qualified_name if interaction.command else "desconhecido"
+    if started_at is not None:
+        handler_latency.observe(time.perf_counter() - started_at, kind="command", name=name)
+    if failed:
+        handler_errors.inc(kind="command", name=name)
+
+# SHARD_COUNT/SHARD_IDS: este processo conecta só uma faixa dos shards (ver sharding.py).
+try:
+    shard_config = ShardConfig.from_env()
+except ValueError as e:
+    print(f"ERRO CRÍTICO: Configuração de shards inválida: {e}", file=sys.stderr)
+    sys.exit(1)
+
+bot = commands.AutoShardedBot(
+    command_prefix="!",
+    intents=intents,
+    tree_cls=InstrumentedCommandTree,
+    **member_cache_options,
+    **shard_config.bot_options()
+)
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    observe_command_latency(interaction)
 
 # --- "Caçador de Erros" ---
 @bot.event
@@ -53,107 +131,452 @@ def clean_emoji_from_string(text):
     """Remove códigos de emoji customizados do Discord de uma string."""
     return re.sub(r'<a?:.+?:\d+>', '', text).strip()
 
-# --- Funções de Templates com MongoDB ---
-def load_templates():
-    data = templates_collection.find_one({"_id": "global_templates"})
-    if data:
-        return data.get("templates", {})
-    return {}
-
-def save_templates(templates_dict):
-    templates_collection.update_one(
-        {"_id": "global_templates"},
-        {"$set": {"templates": templates_dict}},
-        upsert=True
+# --- Estado pronto? ---
+# Os caches (templates, eventos, pagamentos) são aquecidos em segundo plano depois
+# que o bot conecta. Até lá, as interações que dependem deles pedem para tentar de novo.
+data_ready = asyncio.Event()
+
+async def ensure_ready(interaction: discord.Interaction) -> bool:
+    if data_ready.is_set():
+        return True
+    await interaction.response.send_message("O bot ainda está iniciando. Tente novamente em alguns segundos.", ephemeral=True)
+    return False
+
+# --- Templates (cache em memória + MongoDB) ---
+templates = TemplateStore(templates_collection, legacy_collection=legacy_templates_collection)
+# Alterações feitas por outras instâncias (ou direto no banco) chegam ao cache por aqui.
+template_watcher = TemplateWatcher(templates, force_polling=os.getenv("TEMPLATE_SYNC") == "poll")
+
+# --- Persistência de Eventos e Pagamentos ---
+event_store = EventStore(events_collection)
+payment_store = PaymentStore(payments_collection)
+payout_ledger = PayoutLedger(ledger_collection)
+
+# --- Configurações por Servidor ---
+guild_settings = GuildSettingsStore(settings_collection)
+
+# Canal de relatório de antes das configurações por servidor: continua valendo
+# para o servidor dele até que outro canal seja configurado com /configurar.
+LEGACY_REPORT_CHANNEL_ID = 1415693614989836358
+
+async def get_report_channel(guild_id: int):
+    settings = await guild_settings.get(guild_id)
+    channel_id = settings.report_channel_id or LEGACY_REPORT_CHANNEL_ID
+    channel = bot.get_channel(channel_id)
+    if channel is None or channel.guild.id != guild_id:
+        logging.error(f"Canal de relatório {channel_id} não encontrado no servidor {guild_id}.")
+        return None
+    return channel
+
+# --- Rosters dos Eventos e Relatórios de Pagamento (por ID da mensagem) ---
+event_rosters: dict[int, EventRoster] = {}
+payment_reports: dict[int, PaymentReport] = {}
+
+# Eventos encerrados por este processo cujo status gravado ainda pode não valer
+# para uma reconstrução em andamento (ver close_event).
+closed_events: set[int] = set()
+EVENT_CLOSED_MESSAGE = "Este evento já foi encerrado."
+
+async def get_event_roster(message: discord.Message, allow_expired: bool = False) -> EventRoster | None:
+    """Retorna o roster da mensagem, reconstruindo a partir do embed se não estiver em memória.
+
+    None se o evento já foi encerrado: os botões de uma mensagem ainda não riscada
+    não podem reabri-lo. Com `allow_expired`, um evento cujas inscrições a agenda
+    encerrou volta do banco só para leitura, para ainda poder ser concluído.
+    """
+    roster = event_rosters.get(message.id)
+    if roster is not None:
+        return roster
+    if message.id in closed_events and not allow_expired:
+        return None
+    status = await event_store.get_status(message.id)
+    if status == STATUS_EXPIRED and allow_expired:
+        # Não volta para a memória nem ganha um ator: ninguém mais se inscreve.
+        return await event_store.load(message.id)
+    if status not in (None, STATUS_OPEN) or message.id in closed_events:
+        # Encerrado (ou encerrado enquanto o banco era consultado).
+        return None
+    # Mensagem anterior à persistência: o criador vem dos metadados da interação original.
+    metadata = message.interaction_metadata
+    author_id = metadata.user.id if metadata else None
+    return event_rosters.setdefault(message.id, EventRoster.from_embed(message.embeds[0], author_id))
+
+# --- Edits agrupados (no máximo um edit por mensagem a cada janela) ---
+edit_coalescer = EditCoalescer(window=1.0)
+
+# --- Fila de trabalho (passos lentos depois de responder à interação) ---
+def is_transient_error(error: Exception) -> bool:
+    """Falhas que valem uma nova tentativa: 5xx/429 do Discord, rede e MongoDB indisponível."""
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, ConnectionFailure))
+
+job_queue = JobQueue(retry_on=is_transient_error)
+
+# --- Prioridade das chamadas ao Discord (interações > posts > edits cosméticos) ---
+outbound_scheduler = OutboundScheduler()
+
+# --- Atores dos Eventos (fila de alterações por mensagem) ---
+event_actors: dict[int, EventActor] = {}
+
+def render_event(roster: EventRoster, layout_changed: bool = False) -> dict:
+    """Kwargs de edit para o roster; os botões só são recriados se as vagas mudaram."""
+    kwargs = {"embed": roster.to_embed()}
+    if layout_changed:
+        kwargs["view"] = DynamicEventView.for_roster(roster)
+    return kwargs
+
+async def publish_event(message: discord.Message, roster: EventRoster, layout_changed: bool):
+    try:
+        await event_store.save(message, roster)
+    except Exception:
+        logging.exception(f"Falha ao salvar o evento {message.id} no MongoDB.")
+    edit_coalescer.mark_dirty(
+        message,
+        lambda layout_changed=False: render_event(roster, layout_changed),
+        kind="event",
+        layout_changed=layout_changed
+    )
+
+def _drop_idle_actor(actor: EventActor):
+    if event_actors.get(actor.message.id) is actor:
+        del event_actors[actor.message.id]
+
+async def get_event_actor(message: discord.Message) -> EventActor | None:
+    """Retorna o ator da mensagem (None se o evento foi encerrado); todas as alterações do evento devem passar por ele."""
+    actor = event_actors.get(message.id)
+    if actor is None:
+        roster = await get_event_roster(message)
+        if roster is None:
+            return None
+        actor = event_actors.get(message.id)
+        if actor is None:
+            actor = event_actors[message.id] = EventActor(
+                message,
+                roster,
+                publish=publish_event,
+                on_idle=_drop_idle_actor
+            )
+    return actor
+
+def forget_event(message_id: int):
+    closed_events.add(message_id)
+    event_rosters.pop(message_id, None)
+    event_scheduler.cancel(message_id)
+    actor = event_actors.pop(message_id, None)
+    if actor:
+        actor.closed = True
+    edit_coalescer.discard(message_id)
+
+# Conteúdo de uma mensagem já riscada: "~~@everyone, novo evento...~~ `(Inscrições Encerradas)`".
+STRUCK_CONTENT_PATTERN = re.compile(r"~~(?P<content>.*)~~ `\(.*\)`", re.DOTALL)
+
+async def strike_event_message(channel_id: int, message_id: int, label: str, keep_embed: bool = False, view: View = None):
+    """Risca a mensagem de um evento encerrado e tira os botões (ou deixa só os de `view`)."""
+    channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+    try:
+        message = await channel.fetch_message(message_id)
+    except discord.NotFound:
+        logging.warning(f"Mensagem do evento {message_id} não encontrada ao encerrar.")
+        return
+    kwargs = {} if keep_embed else {"embed": None}
+    # Inscrições já encerradas pela agenda: troca o rótulo em vez de riscar de novo.
+    struck = STRUCK_CONTENT_PATTERN.fullmatch(message.content or "")
+    content = struck["content"] if struck else message.content
+    # Não é só cosmético: tira os botões de um evento que já acabou.
+    with priority(PRIORITY_NORMAL):
+        await message.edit(content=f"~~{content}~~ `{label}`", view=view, **kwargs)
+
+async def close_event(channel_id: int, message_id: int, status: str, label: str, keep_embed: bool = False, view: View = None):
+    """Encerra o evento: esquece o roster, grava o status e risca a mensagem (sem os botões, fora os de `view`)."""
+    forget_event(message_id)
+    await asyncio.gather(
+        event_store.set_status(message_id, status),
+        strike_event_message(channel_id, message_id, label, keep_embed, view)
     )
+    # Com o status gravado, a consulta em get_event_roster já basta. O ID fica mais
+    # um pouco para cobrir reconstruções que consultaram o banco antes da gravação.
+    asyncio.get_running_loop().call_later(60, closed_events.discard, message_id)
+
+# --- Agenda: lembretes no tópico do evento e encerramento automático ---
+# EVENT_TIMEZONE: fuso padrão dos horários (cada servidor pode mudar com /configurar).
+default_timezone = resolve_timezone(os.getenv("EVENT_TIMEZONE")) or resolve_timezone(DEFAULT_TIMEZONE)
+
+def settings_timezone(settings: GuildSettings):
+    return resolve_timezone(settings.timezone) or default_timezone
+
+async def event_timezone(guild_id: int):
+    return settings_timezone(await guild_settings.get(guild_id))
+
+def mention_messages(header: str, user_ids: list[int], limit: int = 2000) -> list[str]:
+    """Divide as menções em mensagens dentro do limite de caracteres do Discord."""
+    messages = [header + "\n"]
+    for user_id in user_ids:
+        mention = f"<@{user_id}> "
+        if len(messages[-1]) + len(mention) > limit:
+            messages.append("")
+        messages[-1] += mention
+    return [content.strip() for content in messages]
+
+async def send_event_reminder(event: ScheduledEvent, offset: datetime.timedelta):
+    await bot.wait_until_ready()
+    roster = event_rosters.get(event.message_id)
+    if roster is None:
+        return
+    # O tópico criado a partir da mensagem tem o mesmo ID dela.
+    thread_id = event.thread_id or event.message_id
+    thread = bot.get_channel(thread_id) or await bot.fetch_channel(thread_id)
+    title = roster.title.replace('📢 Evento: ', '')
+    timestamp = int(event.starts_at.timestamp())
+    if offset:
+        header = f"⏰ O evento **{title}** começa <t:{timestamp}:R> (<t:{timestamp}:t>)!"
+    else:
+        header = f"🚀 O evento **{title}** está começando agora!"
+    for content in mention_messages(header, roster.participants()):
+        await thread.send(content, allowed_mentions=discord.AllowedMentions(users=True))
+    await event_store.mark_reminder_sent(event.message_id, int(offset.total_seconds()))
+
+async def auto_close_event(event: ScheduledEvent):
+    """Encerra as inscrições de um evento que já passou e não foi concluído nem cancelado.
+
+    Só os botões de inscrição saem: o criador ainda pode concluir o evento e gerar o relatório.
+    """
+    await bot.wait_until_ready()
+    roster = event_rosters.get(event.message_id)
+    view = DynamicEventView(roster.author_id if roster else None, actions=("conclude_event",))
+    await close_event(event.channel_id, event.message_id, STATUS_EXPIRED, "(Inscrições Encerradas)", keep_embed=True, view=view)
+
+event_scheduler = EventScheduler(on_reminder=send_event_reminder, on_close=auto_close_event)
+
+# --- Nomes de exibição (cache LRU com TTL, sem depender do cache de membros) ---
+display_names = DisplayNameResolver()
 
-templates = load_templates()
+def render_payment(report: PaymentReport, names: dict[int, str]) -> dict:
+    view = PaymentView(report, names)
+    return {"embed": view.update_embed_fields(report.to_embed(), names), "view": view}
 
 
 # --- Views ---
+# Os botões das mensagens de evento e de pagamento são DynamicItems: o estado
+# fica no roster/relatório (e no MongoDB), e o bot reconhece os botões pelo
+# padrão do custom_id. Assim, depois de um restart, basta registrar as classes
+# uma vez no setup_hook, sem recriar uma View por mensagem.
 
 class ConfirmationView(View):
-    def __init__(self, user, old_role_name, new_role_name, original_embed, original_message):
+    def __init__(self, user, old_role_name, new_role_name, original_message):
         super().__init__(timeout=60)
         self.user = user
         self.old_role_name = old_role_name
         self.new_role_name = new_role_name
-        self.original_embed = original_embed
         self.original_message = original_message
 
     @discord.ui.button(label="Sim, quero trocar!", style=discord.ButtonStyle.success)
+    @timed_handler("button", "confirm_swap")
+    @user_facing
     async def confirm_button(self, interaction: discord.Interaction, button: Button):
         if interaction.user != self.user:
             return await interaction.response.send_message("Apenas o jogador original pode confirmar a troca.", ephemeral=True)
 
-        old_role_index = -1
-        new_role_index = -1
-        for i, field in enumerate(self.original_embed.fields):
-            if field.name == self.old_role_name: old_role_index = i
-            if field.name == self.new_role_name: new_role_index = i
-        
-        if old_role_index != -1 and new_role_index != -1:
-            self.original_embed.set_field_at(old_role_index, name=self.old_role_name, value="Vazio", inline=False)
-            self.original_embed.set_field_at(new_role_index, name=self.new_role_name, value=self.user.mention, inline=False)
-            await self.original_message.edit(embed=self.original_embed)
+        # Confirma o clique antes de esperar a vez na fila do evento.
+        await interaction.response.defer()
+        # A vaga pode ter sido preenchida enquanto o jogador decidia.
+        actor = await get_event_actor(self.original_message)
+        if actor is None:
+            return await interaction.edit_original_response(content=EVENT_CLOSED_MESSAGE, view=None)
+        moved = await actor.submit(lambda roster: roster.move(self.user.id, self.old_role_name, self.new_role_name))
+        if not moved:
+            return await interaction.edit_original_response(content="Não foi possível trocar: a vaga já foi preenchida.", view=None)
 
-        await interaction.response.edit_message(content="Vaga trocada com sucesso!", view=None)
+        await interaction.edit_original_response(content="Vaga trocada com sucesso!", view=None)
 
     @discord.ui.button(label="Cancelar", style=discord.ButtonStyle.danger)
+    @timed_handler("button", "cancel_swap")
+    @user_facing
     async def cancel_button(self, interaction: discord.Interaction, button: Button):
         if interaction.user != self.user:
             return await interaction.response.send_message("Apenas o jogador original pode cancelar.", ephemeral=True)
         await interaction.response.edit_message(content="Troca cancelada.", view=None)
 
-class SignupButton(Button):
+async def handle_signup(interaction: discord.Interaction, clicked_role_name: str):
+    """Inscrição numa vaga, pelo botão ou pelo menu de seleção (eventos grandes)."""
+    if not await ensure_ready(interaction):
+        return
+    # Confirma o clique na hora; as respostas vão por followup e o embed é atualizado em lote.
+    await interaction.response.defer()
+    actor = await get_event_actor(interaction.message)
+    if actor is None:
+        return await interaction.followup.send(EVENT_CLOSED_MESSAGE, ephemeral=True)
+    user = interaction.user
+
+    # Verificação e inscrição acontecem juntas dentro do ator, na ordem dos cliques.
+    # Só buscas em dicionário: o custo não depende do tamanho do roster.
+    def apply_signup(roster: EventRoster):
+        current_role_name = roster.slot_of(user.id)
+        if current_role_name == clicked_role_name:
+            return "already_signed", current_role_name
+        if not roster.has_slot(clicked_role_name):
+            return "missing", current_role_name
+        if current_role_name:
+            if roster.is_full(clicked_role_name):
+                return "swap_filled", current_role_name
+            return "swap", current_role_name
+        if not roster.signup(user.id, clicked_role_name):
+            return "filled", None
+        return "signed", None
+
+    outcome, current_role_name = await actor.submit(apply_signup)
+
+    if outcome == "signed":
+        return
+    elif outcome == "already_signed":
+        await interaction.followup.send("Você já está inscrito nesta vaga.", ephemeral=True)
+    elif outcome == "swap_filled":
+        await interaction.followup.send(f"A vaga de **{clicked_role_name}** já foi preenchida.", ephemeral=True)
+    elif outcome == "swap":
+        view = ConfirmationView(user, current_role_name, clicked_role_name, interaction.message)
+        await interaction.followup.send(f"Deseja trocar da vaga **{current_role_name}** para **{clicked_role_name}**?", view=view, ephemeral=True)
+    elif outcome == "missing":
+        await interaction.followup.send("Essa vaga não existe mais.", ephemeral=True)
+    else:
+        await interaction.followup.send("Essa vaga já foi preenchida!", ephemeral=True)
+
+class SignupButton(discord.ui.DynamicItem[Button], template=r"signup_(?P<role>.+)"):
     # CORREÇÃO: O botão agora armazena o nome completo e o nome de exibição separadamente.
-    def __init__(self, full_role_name: str, row: int):
+    def __init__(self, full_role_name: str, row: int = None):
         display_label = clean_emoji_from_string(full_role_name)
-        super().__init__(label=display_label, style=discord.ButtonStyle.secondary, custom_id=f"signup_{full_role_name}", row=row)
+        super().__init__(Button(label=display_label, style=discord.ButtonStyle.secondary, custom_id=f"signup_{full_role_name}", row=row))
         self.full_role_name = full_role_name
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(match["role"])
+
+    @timed_handler("button", "signup")
+    @user_facing
     async def callback(self, interaction: discord.Interaction):
-        original_embed = interaction.message.embeds[0]
-        user = interaction.user
-        # Usa o nome completo com emoji para encontrar o campo correto no embed.
-        clicked_role_name = self.full_role_name
-
-        current_role_field = next((field for field in original_embed.fields if user.mention in field.value), None)
-
-        if current_role_field:
-            if current_role_field.name == clicked_role_name:
-                return await interaction.response.send_message("Você já está inscrito nesta vaga.", ephemeral=True)
-            
-            new_role_field = next((f for f in original_embed.fields if f.name == clicked_role_name), None)
-            if new_role_field and "Vazio" not in new_role_field.value:
-                return await interaction.response.send_message(f"A vaga de **{clicked_role_name}** já foi preenchida.", ephemeral=True)
-
-            view = ConfirmationView(user, current_role_field.name, clicked_role_name, original_embed.copy(), interaction.message)
-            await interaction.response.send_message(f"Deseja trocar da vaga **{current_role_field.name}** para **{clicked_role_name}**?", view=view, ephemeral=True)
+        # Usa o nome completo com emoji para encontrar a vaga correta no roster.
+        await handle_signup(interaction, self.full_role_name)
+
+# Eventos com mais vagas do que cabem em botões usam menus de seleção (25 opções cada).
+MAX_SIGNUP_BUTTONS = 20
+SELECT_MAX_OPTIONS = 25
+MAX_SIGNUP_SELECTS = 4
+
+class SignupSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"signup-select:(?P<page>\d+)"):
+    def __init__(self, page: int, roster: EventRoster = None):
+        options = []
+        if roster is not None:
+            start = page * SELECT_MAX_OPTIONS
+            for slot in roster.slots[start:start + SELECT_MAX_OPTIONS]:
+                options.append(discord.SelectOption(
+                    label=(clean_emoji_from_string(slot) or slot)[:100],
+                    value=slot[:100],
+                    description=f"{roster.capacity[slot]} vaga(s)"
+                ))
+        select = discord.ui.Select(
+            placeholder=f"Inscrever-se ({page * SELECT_MAX_OPTIONS + 1}–{page * SELECT_MAX_OPTIONS + max(len(options), 1)})...",
+            options=options or [discord.SelectOption(label="-")],
+            custom_id=f"signup-select:{page}",
+            row=page + 1
+        )
+        super().__init__(select)
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(int(match["page"]))
+
+    @timed_handler("select", "signup")
+    @user_facing
+    async def callback(self, interaction: discord.Interaction):
+        await handle_signup(interaction, interaction.data['values'][0])
+
+# custom_id -> (rótulo, estilo, mensagem de permissão negada)
+EVENT_ACTIONS = {
+    "add_role": ("➕ Adicionar Vaga", discord.ButtonStyle.success, "Apenas o criador do evento pode adicionar vagas."),
+    "remove_role": ("🗑️ Remover Vaga", discord.ButtonStyle.danger, "Apenas o criador do evento pode remover vagas."),
+    "conclude_event": ("✅ Concluir Evento", discord.ButtonStyle.primary, "Apenas o criador do evento pode concluir o evento."),
+}
+
+class EventControlButton(discord.ui.DynamicItem[Button], template=r"(?P<action>add_role|remove_role|conclude_event)"):
+    def __init__(self, action: str):
+        label, style, _ = EVENT_ACTIONS[action]
+        super().__init__(Button(label=label, style=style, custom_id=action, row=0))
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(match["action"])
+
+    @timed_handler("button", "event_control")
+    @user_facing
+    async def callback(self, interaction: discord.Interaction):
+        if not await ensure_ready(interaction):
+            return
+        # Um evento com as inscrições encerradas pela agenda ainda pode ser concluído.
+        roster = await get_event_roster(interaction.message, allow_expired=self.action == "conclude_event")
+        if roster is None:
+            return await interaction.response.send_message(EVENT_CLOSED_MESSAGE, ephemeral=True)
+        if interaction.user.id != roster.author_id:
+            return await interaction.response.send_message(EVENT_ACTIONS[self.action][2], ephemeral=True)
+
+        if self.action == "add_role":
+            await interaction.response.send_modal(AddRoleModal())
+        elif self.action == "remove_role":
+            await self.remove_role(interaction, roster)
         else:
-            target_field_index = -1
-            for i, field in enumerate(original_embed.fields):
-                if field.name == clicked_role_name:
-                    if "Vazio" in field.value:
-                        target_field_index = i
-                        break
-                    else:
-                        return await interaction.response.send_message("Essa vaga já foi preenchida!", ephemeral=True)
-            
-            if target_field_index != -1:
-                new_embed = original_embed.copy()
-                new_embed.set_field_at(target_field_index, name=clicked_role_name, value=user.mention, inline=False)
-                await interaction.message.edit(embed=new_embed)
-                await interaction.response.defer()
+            view = ConcludeView(author_id=roster.author_id, message_id=interaction.message.id)
+            await interaction.response.send_message("O evento foi cancelado?", view=view, ephemeral=True)
+
+    async def remove_role(self, interaction: discord.Interaction, roster: EventRoster):
+        if not roster.slots:
+            return await interaction.response.send_message("Não há vagas para remover.", ephemeral=True)
+
+        @timed_handler("select", "remove_role")
+        @user_facing
+        async def select_callback(select_interaction: discord.Interaction):
+            role_to_remove = select_interaction.data['values'][0]
+            await select_interaction.response.defer()
+            actor = await get_event_actor(interaction.message)
+            if actor is None:
+                return await select_interaction.followup.send(EVENT_CLOSED_MESSAGE, ephemeral=True)
+            await actor.submit(lambda roster: roster.remove_slot(role_to_remove))
+
+        # Um menu por página de 25 vagas (até 5 menus por mensagem).
+        view = View()
+        for start in range(0, min(len(roster.slots), SELECT_MAX_OPTIONS * 5), SELECT_MAX_OPTIONS):
+            options = [discord.SelectOption(label=slot[:100], value=slot[:100]) for slot in roster.slots[start:start + SELECT_MAX_OPTIONS]]
+            select = discord.ui.Select(placeholder="Selecione a vaga para remover...", options=options)
+            select.callback = select_callback
+            view.add_item(select)
+        await interaction.response.send_message("Qual vaga você deseja remover?", view=view, ephemeral=True)
 
 class DynamicEventView(View):
-    def __init__(self, author_id: int):
+    def __init__(self, author_id: int, actions=EVENT_ACTIONS):
         super().__init__(timeout=None)
         self.author_id = author_id
+        for action in actions:
+            self.add_item(EventControlButton(action))
+
+    @classmethod
+    def for_roster(cls, roster: EventRoster) -> "DynamicEventView":
+        view = cls(author_id=roster.author_id)
+        if len(roster.slots) > MAX_SIGNUP_BUTTONS:
+            view.add_signup_selects(roster)
+        else:
+            view.add_signup_buttons(roster.slots)
+        return view
+
+    def add_signup_selects(self, roster: EventRoster):
+        pages = (len(roster.slots) + SELECT_MAX_OPTIONS - 1) // SELECT_MAX_OPTIONS
+        if pages > MAX_SIGNUP_SELECTS:
+            logging.warning(f"Evento com {len(roster.slots)} vagas: só as primeiras {MAX_SIGNUP_SELECTS * SELECT_MAX_OPTIONS} cabem nos menus.")
+        for page in range(min(pages, MAX_SIGNUP_SELECTS)):
+            self.add_item(SignupSelect(page, roster))
 
     def add_signup_buttons(self, roles: list[str]):
         for item in self.children[:]:
-            if isinstance(item, SignupButton):
+            if isinstance(item, (SignupButton, SignupSelect)):
                 self.remove_item(item)
 
         row = 1
@@ -166,78 +589,24 @@ class DynamicEventView(View):
             # CORREÇÃO: Passa o nome completo (com emoji) para o botão.
             self.add_item(SignupButton(full_role_name=role, row=row))
 
-    @discord.ui.button(label="➕ Adicionar Vaga", style=discord.ButtonStyle.success, custom_id="add_role", row=0)
-    async def add_role_button(self, interaction: discord.Interaction, button: Button):
-        if interaction.user.id != self.author_id:
-            return await interaction.response.send_message("Apenas o criador do evento pode adicionar vagas.", ephemeral=True)
-        modal = AddRoleModal(author_id=self.author_id)
-        await interaction.response.send_modal(modal)
-
-    @discord.ui.button(label="🗑️ Remover Vaga", style=discord.ButtonStyle.danger, custom_id="remove_role", row=0)
-    async def remove_role_button(self, interaction: discord.Interaction, button: Button):
-        if interaction.user.id != self.author_id:
-            return await interaction.response.send_message("Apenas o criador do evento pode remover vagas.", ephemeral=True)
-
-        embed = interaction.message.embeds[0]
-        if not embed.fields:
-            return await interaction.response.send_message("Não há vagas para remover.", ephemeral=True)
-
-        options = [discord.SelectOption(label=field.name) for field in embed.fields]
-        select = discord.ui.Select(placeholder="Selecione a vaga para remover...", options=options)
-
-        async def select_callback(select_interaction: discord.Interaction):
-            role_to_remove = select_interaction.data['values'][0]
-            new_embed = interaction.message.embeds[0].copy()
-            
-            new_fields = [field for field in new_embed.fields if field.name != role_to_remove]
-            new_embed.clear_fields()
-            for field in new_fields:
-                new_embed.add_field(name=field.name, value=field.value, inline=False)
-            
-            new_view = DynamicEventView(author_id=self.author_id)
-            new_view.add_signup_buttons([field.name for field in new_embed.fields])
-            
-            await interaction.message.edit(embed=new_embed, view=new_view)
-            await select_interaction.response.defer()
-
-        select.callback = select_callback
-        view = View()
-        view.add_item(select)
-        await interaction.response.send_message("Qual vaga você deseja remover?", view=view, ephemeral=True)
-
-    @discord.ui.button(label="✅ Concluir Evento", style=discord.ButtonStyle.primary, custom_id="conclude_event", row=0)
-    async def conclude_event_button(self, interaction: discord.Interaction, button: Button):
-        if interaction.user.id != self.author_id:
-            return await interaction.response.send_message("Apenas o criador do evento pode concluir o evento.", ephemeral=True)
-        
-        view = ConcludeView(author_id=self.author_id, message_id=interaction.message.id)
-        await interaction.response.send_message("O evento foi cancelado?", view=view, ephemeral=True)
-
 
 # --- Modals ---
 
 class AddRoleModal(Modal, title="Adicionar Nova Vaga"):
-    def __init__(self, author_id: int):
-        super().__init__()
-        self.author_id = author_id
-
-    role_name_input = TextInput(label="Nome da Vaga", placeholder="Ex: Tank, Healer, DPS Range...", required=True)
+    role_name_input = TextInput(label="Nome da Vaga", placeholder="Ex: Tank, Healer, DPS Range x10...", required=True)
 
+    @timed_handler("modal", "add_role")
+    @user_facing
     async def on_submit(self, interaction: discord.Interaction):
         role_name = self.role_name_input.value.strip()
-        embed = interaction.message.embeds[0]
-
-        if any(field.name.lower() == role_name.lower() for field in embed.fields):
-            return await interaction.response.send_message(f"A vaga '{role_name}' já existe.", ephemeral=True)
-
-        new_embed = embed.copy()
-        new_embed.add_field(name=role_name, value="Vazio", inline=False)
-        
-        new_view = DynamicEventView(author_id=self.author_id)
-        new_view.add_signup_buttons([field.name for field in new_embed.fields])
-
-        await interaction.message.edit(embed=new_embed, view=new_view)
         await interaction.response.defer()
+        actor = await get_event_actor(interaction.message)
+        if actor is None:
+            return await interaction.followup.send(EVENT_CLOSED_MESSAGE, ephemeral=True)
+
+        name, capacity = parse_slot_spec(role_name)
+        if not await actor.submit(lambda roster: roster.add_slot(name, capacity)):
+            await interaction.followup.send(f"A vaga '{role_name}' já existe.", ephemeral=True)
 
 class ConcludeView(View):
     def __init__(self, author_id: int, message_id: int):
@@ -246,17 +615,15 @@ class ConcludeView(View):
         self.message_id = message_id
 
     @discord.ui.button(label="Sim, foi cancelado", style=discord.ButtonStyle.danger)
+    @timed_handler("button", "event_cancelled")
+    @user_facing
     async def yes_button(self, interaction: discord.Interaction, button: Button):
-        try:
-            original_message = await interaction.channel.fetch_message(self.message_id)
-            if original_message:
-                await original_message.edit(content=f"~~{original_message.content}~~ `(Evento Cancelado)`", embed=None, view=None)
-        except discord.NotFound:
-            logging.warning(f"Não foi possível encontrar a mensagem original do evento ({self.message_id}) para cancelar.")
-        
         await interaction.response.edit_message(content="O evento foi marcado como cancelado.", view=None)
+        await close_event(interaction.channel_id, self.message_id, STATUS_CANCELLED, "(Evento Cancelado)")
 
     @discord.ui.button(label="Não, foi concluído", style=discord.ButtonStyle.success)
+    @timed_handler("button", "event_concluded")
+    @user_facing
     async def no_button(self, interaction: discord.Interaction, button: Button):
         modal = LootRepairModal(
             author_id=self.author_id, 
@@ -275,40 +642,48 @@ class LootRepairModal(Modal, title="Detalhes do Evento Concluído"):
     loot_input = TextInput(label="Loot Total", placeholder="Apenas números (ex: 1000000)", required=True)
     repair_input = TextInput(label="Reparo Total", placeholder="Apenas números (ex: 200000)", required=True)
 
+    @timed_handler("modal", "loot_repair")
+    @user_facing
     async def on_submit(self, interaction: discord.Interaction):
-        await self.original_interaction.edit_original_response(content="Processando relatório do evento...", view=None)
-        
+        # Responde na hora; o relatório é montado depois, com os passos independentes em paralelo.
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await job_queue.submit(
+            interaction.guild_id, "edit_original_response",
+            functools.partial(self.original_interaction.edit_original_response, content="Processando relatório do evento...", view=None)
+        )
+
         try:
             total_loot = int(self.loot_input.value)
             total_repair = int(self.repair_input.value)
         except ValueError:
-            return await interaction.response.send_message("Erro: Por favor, insira apenas números para o loot e reparo.", ephemeral=True)
-
-        try:
-            original_message = await interaction.channel.fetch_message(self.message_id)
-        except discord.NotFound:
-            return await interaction.response.send_message("Não foi possível encontrar a mensagem original do evento.", ephemeral=True)
+            return await interaction.followup.send("Erro: Por favor, insira apenas números para o loot e reparo.", ephemeral=True)
+
+        roster = event_rosters.get(self.message_id)
+        if roster is None:
+            try:
+                original_message = await interaction.channel.fetch_message(self.message_id)
+            except discord.NotFound:
+                return await interaction.followup.send("Não foi possível encontrar a mensagem original do evento.", ephemeral=True)
+            roster = await get_event_roster(original_message, allow_expired=True)
+            if roster is None:
+                return await interaction.followup.send(EVENT_CLOSED_MESSAGE, ephemeral=True)
+        participant_ids = roster.participants()
         
-        embed = original_message.embeds[0]
-        participants = [field.value for field in embed.fields if "Vazio" not in field.value]
-        
-        num_participants = len(participants)
+        num_participants = len(participant_ids)
         if num_participants == 0:
-            return await interaction.response.send_message("Não há participantes no evento para dividir o loot.", ephemeral=True)
+            return await interaction.followup.send("Não há participantes no evento para dividir o loot.", ephemeral=True)
 
         loot_per_person = total_loot // num_participants
         repair_per_person = total_repair // num_participants
         payout_per_person = loot_per_person - repair_per_person
 
-        report_channel_id = 1415693614989836358 
-        report_channel = bot.get_channel(report_channel_id)
-
+        report_channel = await get_report_channel(interaction.guild_id)
         if not report_channel:
-            logging.error(f"Não foi possível encontrar o canal de relatório com ID {report_channel_id}.")
-            return await interaction.response.send_message(f"ERRO: Não encontrei o canal de relatório. Verifique o ID no código.", ephemeral=True)
+            return await interaction.followup.send("ERRO: Não encontrei o canal de relatório. Configure um com `/configurar canal_relatorio`.", ephemeral=True)
         
-        report_embed = discord.Embed(
-            title=f"Relatório do Evento: {embed.title.replace('📢 Evento: ', '')}",
+        report = PaymentReport(
+            author_id=self.author_id,
+            title=f"Relatório do Evento: {roster.title.replace('📢 Evento: ', '')}",
             description=(
                 f"**Loot Total:** `{total_loot:,}`\n"
                 f"**Reparo Total:** `{total_repair:,}`\n"
@@ -317,103 +692,295 @@ class LootRepairModal(Modal, title="Detalhes do Evento Concluído"):
                 f"**Reparo Dividido por Pessoa:** `{repair_per_person:,}`\n\n"
                 f"**Pagamento Final por Pessoa:** `{payout_per_person:,}`"
             ),
-            color=discord.Color.green()
+            participant_ids=participant_ids
         )
-        
-        participant_ids = [int(p.strip('<@!>')) for p in participants]
-        view = PaymentView(author_id=self.author_id, participant_ids=participant_ids)
-        view.update_embed_fields(report_embed, interaction)
 
-        await report_channel.send(embed=report_embed, view=view)
-        
-        await interaction.response.defer(ephemeral=True)
-        
-        await original_message.edit(content=f"~~{original_message.content}~~ `(Evento Concluído)`", embed=None, view=None)
+        names = await display_names.resolve_many(interaction.guild, participant_ids)
+        # Duas conclusões do mesmo evento (ex.: dois prompts de Concluir abertos): só a primeira gera relatório.
+        previous_status = await event_store.claim(self.message_id, STATUS_CONCLUDED)
+        if previous_status is None:
+            return await interaction.followup.send(EVENT_CLOSED_MESSAGE, ephemeral=True)
+        try:
+            report_message = await report_channel.send(**render_payment(report, names))
+        except Exception:
+            # Sem relatório, o evento volta a poder ser concluído.
+            await event_store.set_status(self.message_id, previous_status)
+            raise
+        payment_reports[report_message.id] = report
+        # Antes de qualquer await: nenhum clique chega ao roster de um evento já concluído.
+        forget_event(self.message_id)
+
+        async def persist_report():
+            # Cliques em "pago" esperam o relatório estar gravado.
+            async with report.write_lock:
+                await asyncio.gather(
+                    payment_store.create(report_message, report, event_id=self.message_id),
+                    payout_ledger.record_report(
+                        guild_id=interaction.guild_id,
+                        report_id=report_message.id,
+                        event_id=self.message_id,
+                        title=roster.title.replace('📢 Evento: ', ''),
+                        participant_ids=participant_ids,
+                        loot_per_person=loot_per_person,
+                        repair_per_person=repair_per_person
+                    )
+                )
+
+        await asyncio.gather(
+            persist_report(),
+            close_event(interaction.channel_id, self.message_id, STATUS_CONCLUDED, "(Evento Concluído)"),
+            interaction.followup.send(f"Relatório enviado em {report_channel.mention}.", ephemeral=True)
+        )
+
+# Relatórios com mais participantes do que cabem em botões usam menus de seleção
+# (25 participantes cada, vários por vez) e o embed compacto. Acima de 4 menus,
+# os botões de página trocam o grupo de menus mostrado.
+MAX_PAYMENT_BUTTONS = 25
+MAX_PAYMENT_SELECTS = 4
+
+def payment_page_count(report: PaymentReport) -> int:
+    """Quantos grupos de menus o relatório tem."""
+    selects = (len(report.paid) + SELECT_MAX_OPTIONS - 1) // SELECT_MAX_OPTIONS
+    return max((selects + MAX_PAYMENT_SELECTS - 1) // MAX_PAYMENT_SELECTS, 1)
 
 class PaymentView(View):
-    def __init__(self, author_id: int, participant_ids: list[int]):
+    def __init__(self, report: PaymentReport, names: dict[int, str]):
         super().__init__(timeout=None)
-        self.author_id = author_id
-        self.paid_status = {pid: False for pid in participant_ids}
+        self.report = report
         
-        for pid in participant_ids:
-            self.add_item(PaymentButton(user_id=pid, custom_id=f"pay_{pid}"))
-
-    def update_embed_fields(self, embed: discord.Embed, interaction: discord.Interaction):
+        if len(report.paid) <= MAX_PAYMENT_BUTTONS:
+            for pid, is_paid in report.paid.items():
+                self.add_item(PaymentButton(user_id=pid, label=names.get(pid), paid=is_paid))
+        else:
+            self.add_payment_selects(names)
+
+    def add_payment_selects(self, names: dict[int, str]):
+        pages = payment_page_count(self.report)
+        page = min(self.report.page, pages - 1)
+        selects = (len(self.report.paid) + SELECT_MAX_OPTIONS - 1) // SELECT_MAX_OPTIONS
+        first = page * MAX_PAYMENT_SELECTS
+        for row, select in enumerate(range(first, min(first + MAX_PAYMENT_SELECTS, selects))):
+            self.add_item(PaymentSelect(select, self.report, names, row=row))
+        if pages > 1:
+            self.add_item(PaymentPageButton(max(page - 1, 0), "◀ Anteriores", disabled=page == 0))
+            self.add_item(PaymentPageButton(min(page + 1, pages - 1), "Próximos ▶", disabled=page == pages - 1))
+
+    def update_embed_fields(self, embed: discord.Embed, names: dict[int, str]):
         embed.clear_fields()
-        for user_id, is_paid in self.paid_status.items():
-            user = interaction.guild.get_member(user_id)
-            user_name = user.display_name if user else f"ID: {user_id}"
+        if len(self.report.paid) > MAX_PAYMENT_BUTTONS:
+            # Uma linha por participante, várias por campo (como o roster compacto).
+            paid_count = sum(self.report.paid.values())
+            lines = [f"**Pagos:** {paid_count}/{len(self.report.paid)}"]
+            for user_id, is_paid in self.report.paid.items():
+                lines.append(f"{'✅' if is_paid else '❌'} {names.get(user_id, f'ID: {user_id}')}")
+            return add_compact_fields(embed, lines)
+        for user_id, is_paid in self.report.paid.items():
+            user_name = names.get(user_id, f"ID: {user_id}")
             status = "✅ Pago" if is_paid else "❌ Não Pago"
             embed.add_field(name=user_name, value=status, inline=True)
         return embed
 
-class PaymentButton(Button):
-    def __init__(self, user_id: int, custom_id: str):
-        super().__init__(label=f"ID: {user_id}", style=discord.ButtonStyle.secondary, custom_id=custom_id)
+async def get_payment_report(interaction: discord.Interaction) -> PaymentReport | None:
+    """Relatório da mensagem, se o usuário puder alterá-lo; senão responde e retorna None."""
+    if not await ensure_ready(interaction):
+        return None
+    report = payment_reports.get(interaction.message.id)
+    if report is None:
+        # Relatórios quitados ou parados há muito tempo não são recarregados na inicialização.
+        report = await payment_store.load(interaction.message.id)
+        if report is None:
+            await interaction.response.send_message("Este relatório de pagamento não está mais disponível.", ephemeral=True)
+            return None
+        report = payment_reports.setdefault(interaction.message.id, report)
+    if interaction.user.id != report.author_id:
+        await interaction.response.send_message("Apenas o criador do evento pode confirmar o pagamento.", ephemeral=True)
+        return None
+    return report
+
+async def handle_payment(interaction: discord.Interaction, user_ids: list[int]):
+    """Inverte o pagamento dos participantes, pelo botão ou pelo menu (relatórios grandes)."""
+    report = await get_payment_report(interaction)
+    if report is None:
+        return
+    
+    await interaction.response.defer()
+    # Quem clicou já veio no payload: o nome entra no cache sem nenhuma busca.
+    if isinstance(interaction.user, discord.Member):
+        display_names.remember(interaction.user)
+    user_ids = [user_id for user_id in user_ids if user_id in report.paid]
+    for user_id in user_ids:
+        report.toggle(user_id)
+    # Cliques seguidos podem ter as escritas reordenadas: elas são feitas uma de cada
+    # vez por relatório, sempre com o estado mais recente do relatório.
+    async with report.write_lock:
+        for user_id in user_ids:
+            is_paid = report.paid[user_id]
+            try:
+                await payment_store.set_paid(interaction.message.id, user_id, is_paid, settled=report.settled())
+                await payout_ledger.set_paid(interaction.message.id, user_id, is_paid)
+            except Exception:
+                logging.exception(f"Falha ao salvar o pagamento do relatório {interaction.message.id}.")
+    
+    # Nomes vêm do cache LRU; só os que faltam são buscados (em lote) no Discord.
+    names = await display_names.resolve_many(interaction.guild, report.paid)
+    # O embed é montado só no momento do envio, com o estado de pagamentos mais recente.
+    edit_coalescer.mark_dirty(interaction.message, lambda: render_payment(report, names), kind="payment")
+
+class PaymentButton(discord.ui.DynamicItem[Button], template=r"pay_(?P<user_id>\d+)"):
+    def __init__(self, user_id: int, label: str = None, paid: bool = False):
+        style = discord.ButtonStyle.success if paid else discord.ButtonStyle.secondary
+        super().__init__(Button(label=label or f"ID: {user_id}", style=style, custom_id=f"pay_{user_id}"))
         self.user_id = user_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(int(match["user_id"]))
+
+    @timed_handler("button", "payment")
+    @user_facing
     async def callback(self, interaction: discord.Interaction):
-        view: PaymentView = self.view
-        if interaction.user.id != view.author_id:
-            return await interaction.response.send_message("Apenas o criador do evento pode confirmar o pagamento.", ephemeral=True)
-        
-        view.paid_status[self.user_id] = not view.paid_status[self.user_id]
-        
-        user = interaction.guild.get_member(self.user_id)
-        self.label = user.display_name if user else f"ID: {self.user_id}"
-        self.style = discord.ButtonStyle.success if view.paid_status[self.user_id] else discord.ButtonStyle.secondary
-        
-        original_embed = interaction.message.embeds[0]
-        new_embed = view.update_embed_fields(original_embed.copy(), interaction)
-        
-        await interaction.message.edit(embed=new_embed, view=view)
+        await handle_payment(interaction, [self.user_id])
+
+class PaymentSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"pay-select:(?P<page>\d+)"):
+    def __init__(self, page: int, report: PaymentReport = None, names: dict[int, str] = None, row: int = None):
+        start = page * SELECT_MAX_OPTIONS
+        options = []
+        if report is not None:
+            for user_id in list(report.paid)[start:start + SELECT_MAX_OPTIONS]:
+                options.append(discord.SelectOption(
+                    label=(names or {}).get(user_id, f"ID: {user_id}")[:100],
+                    value=str(user_id),
+                    description="✅ Pago" if report.paid[user_id] else "❌ Não Pago"
+                ))
+        select = discord.ui.Select(
+            placeholder=f"Marcar pagamento ({start + 1}–{start + max(len(options), 1)})...",
+            options=options or [discord.SelectOption(label="-")],
+            # Vários participantes de uma vez: cada um selecionado tem o pagamento invertido.
+            max_values=max(len(options), 1),
+            custom_id=f"pay-select:{page}",
+            row=row
+        )
+        super().__init__(select)
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(int(match["page"]))
+
+    @timed_handler("select", "payment")
+    @user_facing
+    async def callback(self, interaction: discord.Interaction):
+        await handle_payment(interaction, [int(value) for value in interaction.data['values']])
+
+class PaymentPageButton(discord.ui.DynamicItem[Button], template=r"pay-page:(?P<page>\d+)"):
+    def __init__(self, page: int, label: str = "-", disabled: bool = False):
+        super().__init__(Button(label=label, style=discord.ButtonStyle.secondary, custom_id=f"pay-page:{page}", disabled=disabled, row=MAX_PAYMENT_SELECTS))
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: Button, match):
+        return cls(int(match["page"]))
+
+    @timed_handler("button", "payment_page")
+    @user_facing
+    async def callback(self, interaction: discord.Interaction):
+        report = await get_payment_report(interaction)
+        if report is None:
+            return
         await interaction.response.defer()
+        report.page = min(self.page, payment_page_count(report) - 1)
+        names = await display_names.resolve_many(interaction.guild, report.paid)
+        await interaction.edit_original_response(**render_payment(report, names))
 
 # --- Comandos ---
+async def save_new_event(message: discord.Message, roster: EventRoster, starts_at: datetime.datetime | None):
+    await event_store.save(message, roster)
+    if starts_at:
+        await event_store.set_schedule(message.id, starts_at, thread_id=message.id)
+
+async def open_event_thread(message: discord.Message, titulo: str):
+    # Numa nova tentativa o tópico pode já existir.
+    thread = message.thread or await message.create_thread(name=f"💬 Discussão do Evento: {titulo}")
+    await thread.send(f"Este é o espaço para discutir e organizar os detalhes do evento **{titulo}**! Usem este chat para combinar estratégias, tirar dúvidas, etc.")
+
 @bot.tree.command(name="criar_evento", description="Cria um novo evento para PTs de Albion.")
 async def criar_evento(
     interaction: discord.Interaction, 
     titulo: str, 
     horario: str, 
-    descricao: str = "Sem descrição.",
+    descricao: str = None,
     vagas: str = None,
     template: str = None
 ):
-    embed = discord.Embed(
+    if not await ensure_ready(interaction):
+        return
+    # A resposta é a própria mensagem do evento (um followup depois de defer não
+    # notificaria o @everyone), então nada lento vem antes dela: as configurações
+    # do servidor vêm do cache (carregado no on_shard_ready e no on_guild_join) e,
+    # se faltarem, valem os padrões enquanto elas são carregadas em segundo plano.
+    settings = guild_settings.cached(interaction.guild_id)
+    descricao = descricao or settings.default_description or "Sem descrição."
+    if not template and not vagas:
+        template = settings.default_template
+    # O horário vira um instante para os lembretes; o texto original continua no embed.
+    starts_at = parse_event_time(horario, settings_timezone(settings))
+    if starts_at and starts_at < datetime.datetime.now(datetime.timezone.utc) - PAST_START_TOLERANCE:
+        timestamp = int(starts_at.timestamp())
+        return await interaction.response.send_message(
+            f"O horário informado (<t:{timestamp}:F>, <t:{timestamp}:R>) já passou. Informe um horário futuro.",
+            ephemeral=True
+        )
+    if starts_at and "<t:" not in horario:
+        timestamp = int(starts_at.timestamp())
+        horario = f"{horario} (<t:{timestamp}:F>, <t:{timestamp}:R>)"
+    roster = EventRoster(
+        author_id=interaction.user.id,
         title=f"📢 Evento: {titulo}",
         description=f"**Horário:** {horario}\n**Descrição:** {descricao}\n\n**Vagas:**",
-        color=discord.Color.gold()
+        footer=f"Evento criado por {interaction.user.display_name}",
+        thumbnail_url="https://assets.albiononline.com/assets/images/items/T8_CHEST_AVALONIAN_ELITE.png"
     )
-    embed.set_footer(text=f"Evento criado por {interaction.user.display_name}")
-    embed.set_thumbnail(url="https://assets.albiononline.com/assets/images/items/T8_CHEST_AVALONIAN_ELITE.png")
 
-    view = DynamicEventView(author_id=interaction.user.id)
-    
     roles_to_add = []
-    if template and template.lower() in templates:
+    template_roles = templates.get(interaction.guild_id, template) if template else None
+    if template_roles is not None:
         # Usa o nome completo (com emoji) do banco de dados
-        roles_to_add = templates[template.lower()]
+        roles_to_add = template_roles
     elif vagas:
         # Usa o nome completo (com emoji) digitado pelo usuário
         roles_to_add = [v.strip() for v in vagas.split(',')]
 
     for role in roles_to_add:
-        embed.add_field(name=role, value="Vazio", inline=False)
+        # "DPS x10" vira uma vaga com capacidade para 10 jogadores.
+        roster.add_slot(*parse_slot_spec(role))
     
-    view.add_signup_buttons(roles_to_add)
+    view = DynamicEventView.for_roster(roster)
 
-    await interaction.response.send_message(f"@everyone, novo evento '{titulo}' criado!", embed=embed, view=view)
+    await interaction.response.send_message(f"@everyone, novo evento '{titulo}' criado!", embed=roster.to_embed(), view=view)
 
     message = await interaction.original_response()
-
-    thread_name = f"💬 Discussão do Evento: {titulo}"
-    new_thread = await message.create_thread(name=thread_name)
-    
-    await new_thread.send(f"Este é o espaço para discutir e organizar os detalhes do evento **{titulo}**! Usem este chat para combinar estratégias, tirar dúvidas, etc.")
+    # Um clique pode ter chegado antes e reconstruído o roster a partir do embed: o
+    # roster daqui é o que vale, com as inscrições feitas por esse clique.
+    early_roster = event_rosters.get(message.id)
+    if early_roster is not None:
+        for user_id, slot in early_roster.user_to_slot.items():
+            roster.signup(user_id, slot)
+    event_rosters[message.id] = roster
+    actor = event_actors.get(message.id)
+    if actor is not None:
+        actor.roster = roster
+    # Gravar o evento e abrir o tópico não dependem um do outro: rodam em paralelo, pela fila.
+    # O tópico criado a partir da mensagem tem o mesmo ID dela.
+    await asyncio.gather(
+        job_queue.submit(interaction.guild_id, "save_event", save_new_event, message, roster, starts_at),
+        job_queue.submit(interaction.guild_id, "create_event_thread", open_event_thread, message, titulo)
+    )
+    if starts_at:
+        event_scheduler.schedule(ScheduledEvent(message.id, interaction.guild_id, message.channel.id, message.id, starts_at))
 
 
 @bot.tree.command(name="criar_template", description="Cria um novo template de vagas.")
+@app_commands.guild_only()
 async def criar_template(interaction: discord.Interaction, nome: str, vagas: str):
     nome = nome.strip().lower()
     # CORREÇÃO: Salva o nome COMPLETO da vaga (com emoji) no banco de dados.
@@ -421,58 +988,285 @@ async def criar_template(interaction: discord.Interaction, nome: str, vagas: str
     if not vagas_list:
         return await interaction.response.send_message("A lista de vagas não pode estar vazia ou conter nomes em branco.", ephemeral=True)
     
-    current_templates = load_templates()
-    current_templates[nome] = vagas_list
-    save_templates(current_templates)
-    
-    global templates
-    templates = current_templates
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    await templates.save(interaction.guild_id, nome, vagas_list)
     
-    await interaction.response.send_message(f"Template '{nome}' criado com sucesso.", ephemeral=True)
+    await interaction.followup.send(f"Template '{nome}' criado com sucesso.", ephemeral=True)
 
 
+TEMPLATES_PER_PAGE = 10
+
 @bot.tree.command(name="listar_templates", description="Lista todos os templates salvos.")
-async def listar_templates(interaction: discord.Interaction):
-    current_templates = load_templates()
+async def listar_templates(interaction: discord.Interaction, pagina: int = 1):
+    if not await ensure_ready(interaction):
+        return
+    current_templates = templates.for_guild(interaction.guild_id)
     if not current_templates:
         return await interaction.response.send_message("Nenhum template salvo.", ephemeral=True)
 
+    # Paginado para o embed não crescer junto com a biblioteca de templates.
+    total_pages = (len(current_templates) + TEMPLATES_PER_PAGE - 1) // TEMPLATES_PER_PAGE
+    pagina = min(max(pagina, 1), total_pages)
+    start = (pagina - 1) * TEMPLATES_PER_PAGE
+    page_items = list(current_templates.items())[start:start + TEMPLATES_PER_PAGE]
+
     embed = discord.Embed(title="Templates Salvos", color=discord.Color.blue())
-    for name, roles in current_templates.items():
-        embed.add_field(name=name.capitalize(), value=", ".join(roles), inline=False)
+    for name, roles in page_items:
+        embed.add_field(name=name.capitalize(), value=", ".join(roles)[:1024], inline=False)
+    embed.set_footer(text=f"Página {pagina}/{total_pages} • {len(current_templates)} template(s)")
     
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="excluir_template", description="Exclui um template salvo.")
+@app_commands.guild_only()
 async def excluir_template(interaction: discord.Interaction, nome: str):
+    if not await ensure_ready(interaction):
+        return
     nome = nome.strip().lower()
+    await interaction.response.defer(ephemeral=True, thinking=True)
     
-    current_templates = load_templates()
-    
-    if nome in current_templates:
-        del current_templates[nome]
-        save_templates(current_templates)
-        
-        global templates
-        templates = current_templates
-        
-        await interaction.response.send_message(f"Template '{nome}' excluído com sucesso.", ephemeral=True)
+    if await templates.delete(interaction.guild_id, nome):
+        await interaction.followup.send(f"Template '{nome}' excluído com sucesso.", ephemeral=True)
+    elif templates.is_global(interaction.guild_id, nome):
+        # Só sobrou o global com esse nome: some deste servidor, os outros continuam vendo.
+        if not interaction.permissions.manage_guild:
+            return await interaction.followup.send(
+                f"Template '{nome}' é global: só quem pode gerenciar o servidor pode removê-lo daqui.", ephemeral=True
+            )
+        await templates.hide(interaction.guild_id, nome)
+        await interaction.followup.send(f"Template '{nome}' removido deste servidor (é global e continua nos outros).", ephemeral=True)
     else:
-        await interaction.response.send_message(f"Template '{nome}' não encontrado.", ephemeral=True)
+        await interaction.followup.send(f"Template '{nome}' não encontrado.", ephemeral=True)
+
+@bot.tree.command(name="configurar", description="Configura o bot neste servidor (canal de relatório e padrões dos eventos).")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+async def configurar(
+    interaction: discord.Interaction,
+    canal_relatorio: discord.TextChannel = None,
+    template_padrao: str = None,
+    descricao_padrao: str = None,
+    fuso_horario: str = None
+):
+    if not await ensure_ready(interaction):
+        return
+    changes = {}
+    if canal_relatorio:
+        changes["report_channel_id"] = canal_relatorio.id
+    if template_padrao:
+        template_padrao = template_padrao.strip().lower()
+        if templates.get(interaction.guild_id, template_padrao) is None:
+            return await interaction.response.send_message(f"Template '{template_padrao}' não encontrado.", ephemeral=True)
+        changes["default_template"] = template_padrao
+    if descricao_padrao:
+        changes["default_description"] = descricao_padrao.strip()
+    if fuso_horario:
+        if resolve_timezone(fuso_horario.strip()) is None:
+            return await interaction.response.send_message(f"Fuso horário '{fuso_horario}' inválido. Use um nome como `America/Sao_Paulo` ou `UTC`.", ephemeral=True)
+        changes["timezone"] = fuso_horario.strip()
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    if changes:
+        settings = await guild_settings.update(interaction.guild_id, **changes)
+    else:
+        settings = await guild_settings.get(interaction.guild_id)
+
+    embed = discord.Embed(title="Configurações do Servidor", color=discord.Color.blue())
+    channel_id = settings.report_channel_id
+    embed.add_field(name="Canal de Relatório", value=f"<#{channel_id}>" if channel_id else "Não configurado", inline=False)
+    embed.add_field(name="Template Padrão", value=settings.default_template or "Nenhum", inline=False)
+    embed.add_field(name="Descrição Padrão", value=settings.default_description or "Sem descrição.", inline=False)
+    embed.add_field(name="Fuso Horário", value=settings.timezone or f"{default_timezone.key} (padrão)", inline=False)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+@criar_evento.autocomplete("template")
+@excluir_template.autocomplete("nome")
+@configurar.autocomplete("template_padrao")
+async def template_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    # Servido do índice em memória: responde bem dentro dos 3 segundos, sem consultar o MongoDB.
+    return [app_commands.Choice(name=name, value=name) for name in templates.suggest(interaction.guild_id, current)]
+
+@bot.tree.command(name="saldo", description="Mostra quanto um jogador ainda tem a receber dos eventos.")
+async def saldo(interaction: discord.Interaction, jogador: discord.Member = None):
+    jogador = jogador or interaction.user
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    balance = await payout_ledger.player_balance(interaction.guild_id, jogador.id)
+
+    embed = discord.Embed(title=f"Saldo de {jogador.display_name}", color=discord.Color.green())
+    embed.add_field(name="A Receber", value=f"`{balance['outstanding']:,}`", inline=True)
+    embed.add_field(name="Já Pago", value=f"`{balance['paid']:,}`", inline=True)
+    embed.add_field(name="Eventos", value=f"`{balance['events']}`", inline=True)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="totais_guilda", description="Mostra os totais de pagamentos do servidor.")
+async def totais_guilda(interaction: discord.Interaction, dias: int = None):
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    since = None
+    if dias:
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=dias)
+    totals = await payout_ledger.guild_totals(interaction.guild_id, since=since)
+
+    period = f"últimos {dias} dia(s)" if dias else "todo o período"
+    embed = discord.Embed(title=f"Totais da Guilda ({period})", color=discord.Color.green())
+    embed.add_field(name="Eventos", value=f"`{totals['events']}`", inline=True)
+    embed.add_field(name="Total Distribuído", value=f"`{totals['total']:,}`", inline=True)
+    embed.add_field(name="Em Aberto", value=f"`{totals['outstanding']:,}`", inline=True)
+    if totals["top_outstanding"]:
+        lines = [f"<@{user_id}>: `{amount:,}`" for user_id, amount in totals["top_outstanding"]]
+        embed.add_field(name="Maiores Saldos a Receber", value="\n".join(lines), inline=False)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+# Histórico lido do banco em lotes e escrito direto num arquivo temporário: a
+# memória não cresce com o tamanho do histórico. Poucas exportações ao mesmo
+# tempo, para não disputar o banco com os botões.
+history_exporter = HistoryExporter(events_collection, ledger_collection)
+export_slots = asyncio.Semaphore(2)
+
+@bot.tree.command(name="exportar", description="Exporta o histórico de eventos, inscrições ou pagamentos do servidor.")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+@app_commands.describe(desde="Primeiro dia (DD/MM/AAAA)", ate="Último dia (DD/MM/AAAA)")
+@app_commands.choices(
+    tipo=[
+        app_commands.Choice(name="Eventos", value="eventos"),
+        app_commands.Choice(name="Inscrições (vagas e jogadores)", value="inscricoes"),
+        app_commands.Choice(name="Pagamentos (livro-caixa)", value="pagamentos"),
+    ],
+    formato=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="NDJSON (um JSON por linha)", value="ndjson"),
+    ]
+)
+async def exportar(interaction: discord.Interaction, tipo: str, formato: str = "csv", desde: str = None, ate: str = None):
+    if not await ensure_ready(interaction):
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        since = parse_export_date(desde) if desde else None
+        until = parse_export_date(ate) if ate else None
+    except ValueError as e:
+        return await interaction.followup.send(str(e), ephemeral=True)
+    start, end = date_range(since, until, await event_timezone(interaction.guild_id))
+
+    filename = f"{tipo}-{interaction.guild_id}.{formato}"
+    async with export_slots:
+        with tempfile.TemporaryFile("w+", newline="", encoding="utf-8") as file:
+            count = await history_exporter.write(tipo, formato, file, interaction.guild_id, start, end)
+            file.flush()
+            size = file.buffer.tell()
+            if count == 0:
+                return await interaction.followup.send("Nada para exportar nesse período.", ephemeral=True)
+            if size > interaction.guild.filesize_limit:
+                return await interaction.followup.send(
+                    f"O arquivo ficou grande demais para o Discord ({size / 1_000_000:.1f} MB). "
+                    "Escolha um período menor com `desde`/`ate` ou use o `export.py` no servidor.",
+                    ephemeral=True
+                )
+            file.buffer.seek(0)
+            await interaction.followup.send(
+                f"{count} linha(s) exportada(s).", file=discord.File(file.buffer, filename=filename), ephemeral=True
+            )
 
 # --- Evento de Inicialização ---
+warm_up_task = None
+template_watcher_task = None
+
+async def warm_up():
+    """Conecta ao MongoDB e aquece os caches em segundo plano, tentando de novo se o banco falhar."""
+    global template_watcher_task
+    delay = 1
+    while True:
+        try:
+            await client.admin.command('ping')
+            startup_timer.mark("mongo_ping")
+            print("Conectado ao MongoDB com sucesso!")
+            await templates.load(owns=shard_config.owns)
+            startup_timer.mark("templates_loaded")
+            if template_watcher_task is None:
+                template_watcher_task = asyncio.create_task(template_watcher.run(), name="template-watcher")
+
+            await event_store.ensure_indexes()
+            await payment_store.ensure_indexes()
+            await payout_ledger.ensure_indexes()
+            # setdefault: não sobrescreve estado criado enquanto o aquecimento rodava.
+            for message_id, roster in (await event_store.load_open(owns=shard_config.owns)).items():
+                event_rosters.setdefault(message_id, roster)
+            for message_id, report in (await payment_store.load_open(owns=shard_config.owns)).items():
+                payment_reports.setdefault(message_id, report)
+            for event in await event_store.load_schedule(owns=shard_config.owns):
+                if event.message_id not in event_scheduler.events:
+                    event_scheduler.schedule(event)
+            startup_timer.mark("state_rehydrated")
+            break
+        except Exception as e:
+            print(f"Falha ao conectar ao MongoDB ({e}); nova tentativa em {delay}s.", file=sys.stderr)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+    data_ready.set()
+    event_scheduler.start()
+
+    # Os comandos são globais: com vários processos, só o dono do shard 0 sincroniza.
+    if shard_config.is_primary:
+        try:
+            synced = await sync_commands_if_changed(bot.tree, meta_collection)
+            if synced is None:
+                print("Comandos sem alterações; sincronização ignorada.")
+            else:
+                print(f"Sincronizado {synced} comando(s).")
+        except Exception as e:
+            print(f"Erro ao sincronizar comandos: {e}")
+    startup_timer.mark("commands_synced")
+    print_startup_report()
+
+def print_startup_report():
+    # Só quando o gateway e o aquecimento terminaram (a ordem entre os dois varia).
+    if "gateway_ready" in startup_timer.phases and "commands_synced" in startup_timer.phases:
+        print(startup_timer.report())
+
+@bot.event
+async def setup_hook():
+    startup_timer.mark("setup_hook")
+    # Reabre os botões de todas as mensagens em aberto: os DynamicItems são
+    # registrados uma vez e o estado é recarregado em lote do banco.
+    bot.add_dynamic_items(SignupButton, SignupSelect, EventControlButton, PaymentButton, PaymentSelect, PaymentPageButton)
+    # Não bloqueia a conexão com o gateway esperando pelo banco.
+    global warm_up_task
+    warm_up_task = asyncio.create_task(warm_up(), name="warm-up")
+    job_queue.start()
+    outbound_scheduler.install(bot.http)
+    # Saúde e métricas no mesmo loop do bot (substitui a thread do Flask).
+    await keep_alive(bot, ready_check=data_ready.is_set, port=int(os.getenv("PORT", 8080)))
+
 @bot.event
 async def on_ready():
-    print(f'Bot {bot.user} está online e pronto!')
-    try:
-        synced = await bot.tree.sync()
-        print(f"Sincronizado {len(synced)} comando(s).")
-    except Exception as e:
-        print(f"Erro ao sincronizar comandos: {e}")
+    # on_ready também dispara em reconexões; a sincronização de comandos não acontece mais aqui.
+    print(f'Bot {bot.user} está online e pronto! ({shard_config.describe()}, {len(bot.guilds)} servidor(es))')
+    if "gateway_ready" not in startup_timer.phases:
+        startup_timer.mark("gateway_ready")
+        print_startup_report()
     
+@bot.event
+async def on_shard_ready(shard_id: int):
+    logging.info(f"Shard {shard_id} conectado.")
+    # Carrega em lote as configurações dos servidores do shard (depois do aquecimento).
+    await data_ready.wait()
+    guild_ids = [guild.id for guild in bot.guilds if guild.shard_id == shard_id]
+    try:
+        await guild_settings.preload(guild_ids)
+    except Exception:
+        logging.exception(f"Falha ao carregar as configurações dos servidores do shard {shard_id}.")
+
+@bot.event
+async def on_guild_join(guild: discord.Guild):
+    # Servidor novo: as configurações entram no cache antes do primeiro /criar_evento.
+    await data_ready.wait()
+    try:
+        await guild_settings.preload([guild.id])
+    except Exception:
+        logging.exception(f"Falha ao carregar as configurações do servidor {guild.id}.")
+
 # --- Ligar o Bot ---
 if __name__ == "__main__":
-    keep_alive()
     token = os.getenv("DISCORD_TOKEN")
     if token:
         bot.run(token)
@@ -0,0 +1,89 @@
+import logging
+import time
+from collections import OrderedDict
+
+import discord
+
+# --- Nomes de Exibição dos Membros ---
+# Cache LRU com TTL de (servidor, usuário) -> nome de exibição. Assim o bot não
+# depende do cache completo de membros (intents.members + chunking), que ocupa
+# muita memória em servidores grandes. Nomes que faltam são buscados em lote
+# com query_members (até 100 IDs por chamada).
+
+QUERY_BATCH_SIZE = 100
+
+
+class DisplayNameResolver:
+    """Resolve nomes de exibição com cache LRU limitado e expiração."""
+
+    def __init__(self, max_size: int = 5000, ttl: float = 600.0, negative_ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # IDs que não foram encontrados ficam menos tempo no cache.
+        self.negative_ttl = negative_ttl
+        self._cache: OrderedDict[tuple[int, int], tuple[str | None, float]] = OrderedDict()
+
+    def _get(self, key: tuple[int, int]):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _put(self, key: tuple[int, int], name: str | None):
+        ttl = self.ttl if name is not None else self.negative_ttl
+        self._cache[key] = (name, time.monotonic() + ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def remember(self, member: discord.Member):
+        """Guarda o nome de um membro que já veio no payload (ex.: quem clicou no botão)."""
+        self._put((member.guild.id, member.id), member.display_name)
+
+    async def resolve_many(self, guild: discord.Guild, user_ids) -> dict[int, str]:
+        """Nome de exibição de cada usuário; quem não for encontrado vira "ID: <id>"."""
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            entry = self._get((guild.id, user_id))
+            if entry is not None:
+                names[user_id] = entry[0]
+                continue
+            member = guild.get_member(user_id)
+            if member is not None:
+                self._put((guild.id, user_id), member.display_name)
+                names[user_id] = member.display_name
+            else:
+                missing.append(user_id)
+
+        for start in range(0, len(missing), QUERY_BATCH_SIZE):
+            batch = missing[start:start + QUERY_BATCH_SIZE]
+            for member in await self._query(guild, batch):
+                self._put((guild.id, member.id), member.display_name)
+                names[member.id] = member.display_name
+            for user_id in batch:
+                if user_id not in names:
+                    self._put((guild.id, user_id), None)
+
+        return {user_id: names.get(user_id) or f"ID: {user_id}" for user_id in user_ids}
+
+    async def _query(self, guild: discord.Guild, user_ids: list[int]) -> list[discord.Member]:
+        try:
+            # cache=False: não enche o cache de membros do discord.py.
+            return await guild.query_members(user_ids=user_ids, limit=len(user_ids), cache=False)
+        except discord.ClientException:
+            # Sem o intent de membros: busca um a um pela API.
+            members = []
+            for user_id in user_ids:
+                try:
+                    members.append(await guild.fetch_member(user_id))
+                except discord.HTTPException:
+                    pass
+            return members
+        except Exception:
+            logging.exception(f"Falha ao buscar membros do servidor {guild.id}.")
+            return []
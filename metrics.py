@@ -0,0 +1,173 @@
+import functools
+import time
+from contextlib import contextmanager
+
+# --- Métricas em memória ---
+# Contadores, gauges e histogramas simples, sem dependências externas. Cada métrica
+# guarda seus valores por combinação de labels (tupla ordenada de pares).
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+class Counter:
+    """Contador monotônico com labels opcionais."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+
+class Gauge:
+    """Valor instantâneo (ex.: latência atual do gateway)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.values = {}
+
+    def set(self, value: float, **labels):
+        self.values[_label_key(labels)] = value
+
+    def get(self, **labels) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+
+class Histogram:
+    """Histograma de latências (em segundos) com buckets cumulativos."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self.values.get(key)
+        if series is None:
+            # [contagens por bucket..., soma, total]
+            series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def counter(name: str, description: str) -> Counter:
+    """Retorna o contador registrado com esse nome, criando se necessário."""
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = Counter(name, description)
+    return metric
+
+
+def gauge(name: str, description: str) -> Gauge:
+    """Retorna o gauge registrado com esse nome, criando se necessário."""
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = Gauge(name, description)
+    return metric
+
+
+def histogram(name: str, description: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    """Retorna o histograma registrado com esse nome, criando se necessário."""
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = Histogram(name, description, buckets)
+    return metric
+
+
+mongo_latency = histogram("mongo_operation_seconds", "Latência das operações no MongoDB.")
+mongo_errors = counter("mongo_operation_errors_total", "Operações no MongoDB que falharam.")
+
+
+@contextmanager
+def track_mongo(op: str):
+    """Mede a latência de uma operação no MongoDB e conta as falhas."""
+    try:
+        with mongo_latency.time(op=op):
+            yield
+    except Exception:
+        mongo_errors.inc(op=op)
+        raise
+
+
+handler_latency = histogram("handler_latency_seconds", "Latência dos handlers de comandos, botões e modals.")
+handler_errors = counter("handler_errors_total", "Handlers que terminaram com exceção.")
+
+
+def timed_handler(kind: str, name: str):
+    """Decorator para callbacks de botões/modals: mede a latência e conta as exceções."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                handler_errors.inc(kind=kind, name=name)
+                raise
+            finally:
+                handler_latency.observe(time.perf_counter() - start, kind=kind, name=name)
+        return wrapper
+    return decorator
+
+
+# --- Exposição no formato do Prometheus ---
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus() -> str:
+    """Todas as métricas registradas no formato texto do Prometheus (versão 0.0.4)."""
+    lines = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in metric.values.items():
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(key)} {value}")
+                continue
+            for bound, count in zip(metric.buckets, value):
+                lines.append(f"{metric.name}_bucket{_format_labels(key, (('le', bound),))} {count}")
+            lines.append(f"{metric.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {value[-1]}")
+            lines.append(f"{metric.name}_sum{_format_labels(key)} {value[-2]}")
+            lines.append(f"{metric.name}_count{_format_labels(key)} {value[-1]}")
+    return "\n".join(lines) + "\n"
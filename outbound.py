@@ -0,0 +1,309 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+from contextlib import contextmanager
+
+from metrics import counter, gauge, histogram
+
+# --- Prioridade das Chamadas ao Discord ---
+# Todas as chamadas REST do bot (HTTPClient.request) passam por aqui antes da
+# fila de rate limit do discord.py, que atende na ordem de chegada. Cada bucket
+# do Discord ganha uma fila por prioridade:
+#
+# - interaction: chamadas feitas pelos handlers enquanto o usuário espera. As
+#   respostas às interações (defer, followup, edit_original_response) usam o
+#   token da interação, fora dos buckets do bot: essas nunca entram na fila.
+# - normal: posts, tópicos, lembretes e buscas.
+# - edit: edits cosméticos (embeds dos eventos e relatórios). Saem por último,
+#   deixam uma vaga de cada janela do bucket para as outras classes e, enquanto
+#   esperam, um edit mais novo da mesma mensagem substitui o anterior.
+#
+# O uso de cada bucket (limite, restantes, reset) vem do estado que o
+# discord.py mantém a partir dos headers de rate limit: com o bucket esgotado,
+# as chamadas esperam o reset aqui, já em ordem de prioridade, em vez de
+# entrarem na fila do discord.py (ou arriscarem um 429).
+
+PRIORITY_INTERACTION = 0
+PRIORITY_NORMAL = 1
+PRIORITY_EDIT = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTION: "interaction", PRIORITY_NORMAL: "normal", PRIORITY_EDIT: "edit"}
+
+# Vagas de cada janela do bucket que os edits deixam para as outras classes.
+EDIT_RESERVE = 1
+
+requests_total = counter("discord_requests_total", "Chamadas REST ao Discord, por prioridade.")
+edits_collapsed = counter("discord_edits_collapsed_total", "Edits substituídos por um mais novo da mesma mensagem antes de saírem da fila.")
+requests_queued = gauge("discord_requests_queued", "Chamadas esperando vaga no bucket, por prioridade.")
+queue_delay = histogram("discord_request_queue_seconds", "Espera na fila de prioridade antes do envio, por prioridade.")
+
+_priority: contextvars.ContextVar[int | None] = contextvars.ContextVar("outbound_priority", default=None)
+
+# Resultado de um edit substituído cujo substituto foi abandonado: ele voltou para a fila.
+_REQUEUED = object()
+
+
+@contextmanager
+def priority(level: int):
+    """Define a prioridade das chamadas feitas dentro do bloco (e nas tasks criadas nele)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def mark_user_facing():
+    """Marca o resto da task atual como prioridade de interação (ex.: num interaction_check)."""
+    _priority.set(PRIORITY_INTERACTION)
+
+
+def user_facing(func):
+    """Decorator para callbacks de botões, menus e modals: o usuário está esperando."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with priority(PRIORITY_INTERACTION):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def classify(route) -> int:
+    level = _priority.get()
+    if level is not None:
+        return level
+    if route.method == "PATCH" and "/messages/" in route.path:
+        return PRIORITY_EDIT
+    return PRIORITY_NORMAL
+
+
+class _Request:
+    __slots__ = ("priority", "sequence", "url", "fields", "admitted", "result", "followers")
+
+    def __init__(self, level: int, sequence: int, url: str, fields: frozenset | None):
+        self.priority = level
+        self.sequence = sequence
+        self.url = url
+        # Campos do edit; None quando a chamada não pode ser substituída por outra.
+        self.fields = fields
+        self.reset()
+        # Edits que este substituiu, do mais antigo para o mais novo.
+        self.followers: list[_Request] = []
+
+    def reset(self):
+        loop = asyncio.get_running_loop()
+        # True: pode enviar; False: foi substituído e recebe o resultado de `result`.
+        self.admitted = loop.create_future()
+        self.result = loop.create_future()
+
+    def __lt__(self, other: "_Request") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    def settle(self, data=None, error: BaseException = None):
+        for follower in self.followers:
+            if follower.result.done():
+                continue
+            if error is not None:
+                follower.result.set_exception(error)
+            else:
+                follower.result.set_result(data)
+
+
+class _Gate:
+    """Fila de prioridade de um bucket do Discord."""
+
+    def __init__(self, scheduler: "OutboundScheduler", key: str):
+        self.scheduler = scheduler
+        self.key = key
+        self.loop = asyncio.get_running_loop()
+        self.waiting: list[_Request] = []
+        # url -> edit na fila que ainda pode ser substituído
+        self.queued_edits: dict[str, _Request] = {}
+        self.in_flight = 0
+        self.timer: asyncio.TimerHandle | None = None
+
+    def free_slots(self, ratelimit) -> int:
+        if ratelimit is None:
+            # Bucket ainda desconhecido: uma chamada por vez até o Discord informar o limite.
+            return 1 - self.in_flight
+        if ratelimit.expires is None or self.loop.time() >= ratelimit.expires:
+            # Janela nova.
+            return ratelimit.limit - self.in_flight
+        # O discord.py já desconta de `remaining` as chamadas que estão com ele.
+        return min(ratelimit.remaining, ratelimit.limit - self.in_flight)
+
+    def admits(self, request: _Request) -> bool:
+        ratelimit = self.scheduler.ratelimit(self.key)
+        free = self.free_slots(ratelimit)
+        if request.priority < PRIORITY_EDIT:
+            return free > 0
+        limit = ratelimit.limit if ratelimit is not None else 1
+        return free > (EDIT_RESERVE if limit > EDIT_RESERVE else 0)
+
+    def enqueue(self, request: _Request):
+        if request.fields is not None:
+            previous = self.queued_edits.get(request.url)
+            if previous is not None and previous.fields <= request.fields:
+                # O edit novo cobre todos os campos do anterior: só ele é enviado.
+                request.followers = previous.followers + [previous]
+                previous.followers = []
+                edits_collapsed.inc()
+                self._leave_queue(previous, admitted=False)
+            self.queued_edits[request.url] = request
+        heapq.heappush(self.waiting, request)
+        self._count(request, +1)
+        self.pump()
+
+    def _count(self, request: _Request, delta: int):
+        name = PRIORITY_NAMES[request.priority]
+        requests_queued.set(requests_queued.get(priority=name) + delta, priority=name)
+
+    def _leave_queue(self, request: _Request, admitted: bool):
+        # A entrada de um edit substituído fica no heap e é descartada quando chegar ao topo.
+        if self.queued_edits.get(request.url) is request:
+            del self.queued_edits[request.url]
+        self._count(request, -1)
+        request.admitted.set_result(admitted)
+
+    def abandon(self, request: _Request):
+        """Quem esperava desistiu (task cancelada): libera a vaga ou sai da fila."""
+        admitted = request.admitted
+        if admitted.done() and not admitted.cancelled() and admitted.result():
+            # Tinha vaga, mas não chegou a enviar.
+            self.hand_off(request)
+            self.release()
+            return
+        if not admitted.done() or admitted.cancelled():
+            if self.queued_edits.get(request.url) is request:
+                del self.queued_edits[request.url]
+            self._count(request, -1)
+            admitted.cancel()
+            self.hand_off(request)
+            self.pump()
+
+    def hand_off(self, request: _Request):
+        """O edit não vai (ou pode não ter ido) ao Discord: o mais novo que ele substituiu volta para a fila."""
+        followers = [follower for follower in request.followers if not follower.result.done()]
+        request.followers = []
+        if not followers:
+            return
+        newest = followers.pop()
+        queued = self.queued_edits.get(newest.url)
+        if queued is not None and newest.fields <= queued.fields:
+            # Um edit ainda mais novo da mesma mensagem já está na fila e cobre estes.
+            queued.followers = followers + [newest] + queued.followers
+            return
+        # Quem esperava `newest` está em `await newest.result`: recebe _REQUEUED e volta a esperar a vaga.
+        waiting = newest.result
+        newest.reset()
+        newest.followers = followers
+        if queued is None:
+            self.queued_edits[newest.url] = newest
+        heapq.heappush(self.waiting, newest)
+        self._count(newest, +1)
+        waiting.set_result(_REQUEUED)
+
+    def pump(self):
+        while self.waiting:
+            request = self.waiting[0]
+            if request.admitted.done():
+                heapq.heappop(self.waiting)
+                continue
+            if not self.admits(request):
+                break
+            heapq.heappop(self.waiting)
+            self.in_flight += 1
+            self._leave_queue(request, admitted=True)
+        if self.waiting and self.in_flight == 0:
+            self._wake_at_reset()
+
+    def _wake_at_reset(self):
+        # Nenhuma chamada em andamento para liberar vaga: acorda quando a janela do bucket reiniciar.
+        if self.timer is not None:
+            return
+        ratelimit = self.scheduler.ratelimit(self.key)
+        expires = ratelimit.expires if ratelimit is not None else None
+        delay = max(expires - self.loop.time(), 0.0) if expires is not None else 0.0
+        self.timer = self.loop.call_later(delay + 0.01, self._on_timer)
+
+    def _on_timer(self):
+        self.timer = None
+        self.pump()
+
+    def release(self):
+        self.in_flight -= 1
+        self.pump()
+        if not self.waiting and self.in_flight == 0 and self.timer is None:
+            if self.scheduler.gates.get(self.key) is self:
+                del self.scheduler.gates[self.key]
+
+
+class OutboundScheduler:
+    """Filas de prioridade por bucket na frente do HTTPClient do discord.py."""
+
+    def __init__(self):
+        self.http = None
+        self._send = None
+        self.gates: dict[str, _Gate] = {}
+        self._sequence = itertools.count()
+
+    def install(self, http):
+        """Passa a interceptar `http.request` (o HTTPClient do bot)."""
+        if self._send is not None:
+            return
+        self.http = http
+        self._send = http.request
+        http.request = self.request
+
+    def bucket_key(self, route) -> str:
+        # A mesma chave do discord.py: hash do bucket (quando já conhecido) + parâmetros principais.
+        bucket_hash = getattr(self.http, "_bucket_hashes", {}).get(route.key)
+        return f"{bucket_hash or route.key}:{route.major_parameters}"
+
+    def ratelimit(self, key: str):
+        """Estado do bucket no discord.py (limit, remaining, expires), ou None se ainda não existe."""
+        return getattr(self.http, "_buckets", {}).get(key)
+
+    async def request(self, route, **kwargs):
+        level = classify(route)
+        name = PRIORITY_NAMES[level]
+        requests_total.inc(priority=name)
+        key = self.bucket_key(route)
+        gate = self.gates.get(key)
+        if gate is None:
+            gate = self.gates[key] = _Gate(self, key)
+
+        fields = None
+        if level == PRIORITY_EDIT and route.method == "PATCH" and not kwargs.get("files") \
+                and isinstance(kwargs.get("json"), dict):
+            fields = frozenset(kwargs["json"])
+        request = _Request(level, next(self._sequence), route.url, fields)
+        start = gate.loop.time()
+        gate.enqueue(request)
+        while True:
+            try:
+                admitted = await request.admitted
+            except asyncio.CancelledError:
+                gate.abandon(request)
+                raise
+            if admitted:
+                break
+            # Substituído por um edit mais novo da mesma mensagem.
+            result = await request.result
+            if result is not _REQUEUED:
+                return result
+            # Quem esperava o edit mais novo desistiu: este voltou para a fila no lugar dele.
+        queue_delay.observe(gate.loop.time() - start, priority=name)
+        try:
+            data = await self._send(route, **kwargs)
+        except asyncio.CancelledError:
+            # Não dá para saber se o edit chegou ao Discord: os que ele substituiu não se perdem.
+            gate.hand_off(request)
+            raise
+        except BaseException as error:
+            request.settle(error=error)
+            raise
+        finally:
+            gate.release()
+        request.settle(data)
+        return data
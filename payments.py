@@ -0,0 +1,50 @@
+import asyncio
+
+import discord
+
+# --- Relatório de Pagamentos ---
+# Estado de um relatório de evento concluído: quem participou e quem já foi pago.
+# É a fonte da verdade para a PaymentView; o embed é renderizado a partir dele.
+
+
+class PaymentReport:
+    """Participantes de um evento concluído e o status de pagamento de cada um."""
+
+    __slots__ = ("author_id", "title", "description", "paid", "write_lock", "page")
+
+    def __init__(self, author_id: int, title: str, description: str, participant_ids: list[int] = None):
+        self.author_id = author_id
+        self.title = title
+        self.description = description
+        # Dicionário ordenado: a ordem dos participantes é a ordem dos botões.
+        self.paid: dict[int, bool] = {pid: False for pid in participant_ids or []}
+        # Serializa as escritas do relatório no banco; vive (e some) junto com ele.
+        self.write_lock = asyncio.Lock()
+        # Grupo de menus mostrado em relatórios grandes (só em memória; volta ao primeiro no restart).
+        self.page = 0
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "PaymentReport":
+        report = cls(author_id=doc["author_id"], title=doc["title"], description=doc["description"])
+        report.paid = {p["user_id"]: p["paid"] for p in doc.get("participants", [])}
+        return report
+
+    def to_document(self) -> dict:
+        return {
+            "author_id": self.author_id,
+            "title": self.title,
+            "description": self.description,
+            "participants": [{"user_id": user_id, "paid": paid} for user_id, paid in self.paid.items()],
+        }
+
+    def settled(self) -> bool:
+        """Todos os participantes já foram pagos."""
+        return all(self.paid.values())
+
+    def toggle(self, user_id: int) -> bool:
+        """Inverte o status de pagamento do participante e retorna o novo valor."""
+        self.paid[user_id] = not self.paid[user_id]
+        return self.paid[user_id]
+
+    def to_embed(self) -> discord.Embed:
+        return discord.Embed(title=self.title, description=self.description, color=discord.Color.green())
@@ -0,0 +1,250 @@
+import re
+
+import discord
+
+# --- Roster do Evento ---
+# Modelo compacto das vagas de uma mensagem de evento. É a fonte da verdade:
+# os cliques consultam e alteram o roster (buscas O(1) nos dicionários) e o
+# embed é apenas renderizado a partir dele.
+#
+# Cada vaga tem uma capacidade ("DPS x10" = 10 jogadores). Eventos com vagas
+# de capacidade > 1 ou com mais vagas do que cabem em campos do embed usam a
+# renderização compacta, com vários jogadores por campo.
+
+EMPTY_SLOT = "Vazio"
+MENTION_PATTERN = re.compile(r"<@!?(\d+)>")
+SLOT_SPEC_PATTERN = re.compile(r"^(?P<name>.*?)\s*[xX×]\s*(?P<capacity>\d+)$")
+# Linha de uma vaga na renderização compacta: "**DPS** (3/10): <@a> <@b>".
+COMPACT_LINE_PATTERN = re.compile(r"^\*\*(?P<slot>.+)\*\* \((?P<count>\d+)/(?P<capacity>\d+)\):")
+COMPACT_FIELD_NAME = "\u200b"
+
+MAX_SLOT_CAPACITY = 100
+# Limites de payload do Discord para embeds.
+EMBED_MAX_FIELDS = 25
+EMBED_FIELD_VALUE_LIMIT = 1024
+EMBED_TOTAL_LIMIT = 6000
+
+
+def parse_slot_spec(text: str) -> tuple[str, int]:
+    """Separa nome e capacidade de uma vaga: "DPS x10" -> ("DPS", 10); "Tank" -> ("Tank", 1)."""
+    text = text.strip()
+    match = SLOT_SPEC_PATTERN.match(text)
+    if match and match["name"]:
+        return match["name"], min(max(int(match["capacity"]), 1), MAX_SLOT_CAPACITY)
+    return text, 1
+
+
+def pack_field_values(lines) -> list[str]:
+    """Junta as linhas (cada uma até 1024 caracteres) no menor número de valores de campo."""
+    values = []
+    current = ""
+    for line in lines:
+        if current and len(current) + 1 + len(line) > EMBED_FIELD_VALUE_LIMIT:
+            values.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        values.append(current)
+    return values
+
+
+def add_compact_fields(embed: discord.Embed, lines) -> discord.Embed:
+    """Adiciona as linhas em campos sem nome, dentro dos 25 campos e 6000 caracteres do embed."""
+    budget = EMBED_TOTAL_LIMIT - len(embed)
+    values = pack_field_values(lines)
+    for i, value in enumerate(values):
+        last_field = len(embed.fields) == EMBED_MAX_FIELDS - 1 and i < len(values) - 1
+        if last_field or len(value) + 1 > budget:
+            embed.add_field(name=COMPACT_FIELD_NAME, value="… (lista truncada pelo limite do Discord)", inline=False)
+            break
+        embed.add_field(name=COMPACT_FIELD_NAME, value=value, inline=False)
+        budget -= len(value) + 1
+    return embed
+
+
+class EventRoster:
+    """Vagas de um evento: vaga -> usuários (com capacidade) e usuário -> vaga."""
+
+    __slots__ = ("author_id", "title", "description", "footer", "thumbnail_url",
+                 "slots", "capacity", "slot_members", "user_to_slot", "_slot_keys",
+                 "version", "layout_version")
+
+    def __init__(self, author_id: int, title: str, description: str, footer: str = None,
+                 thumbnail_url: str = None, slots: list[str] = None):
+        self.author_id = author_id
+        self.title = title
+        self.description = description
+        self.footer = footer
+        self.thumbnail_url = thumbnail_url
+        self.slots: list[str] = []
+        self.capacity: dict[str, int] = {}
+        # Dicionário usado como conjunto ordenado: ordem de inscrição e remoção O(1).
+        self.slot_members: dict[str, dict[int, None]] = {}
+        self.user_to_slot: dict[int, str] = {}
+        # Nome em minúsculas -> nome da vaga, para checar duplicatas sem varrer a lista.
+        self._slot_keys: dict[str, str] = {}
+        # Incrementados a cada alteração (layout_version só quando a lista de vagas muda),
+        # para saber se é preciso re-renderizar o embed e/ou os botões.
+        self.version = 0
+        self.layout_version = 0
+        for slot in slots or []:
+            self.add_slot(*parse_slot_spec(slot))
+
+    @classmethod
+    def from_embed(cls, embed: discord.Embed, author_id: int) -> "EventRoster":
+        """Reconstrói o roster a partir de um embed já publicado (mensagens sem estado em memória)."""
+        roster = cls(
+            author_id=author_id,
+            title=embed.title,
+            description=embed.description,
+            footer=embed.footer.text,
+            thumbnail_url=embed.thumbnail.url,
+        )
+        # Vaga da última linha compacta: as linhas "↳" podem continuar no campo seguinte.
+        slot = None
+        for field in embed.fields:
+            if field.name != COMPACT_FIELD_NAME:
+                roster.add_slot(field.name)
+                match = MENTION_PATTERN.search(field.value or "")
+                if match:
+                    roster.signup(int(match.group(1)), field.name)
+                continue
+            # Campo compacto: "**DPS** (3/10): <@a> <@b>", continuado por linhas "↳ <@c>".
+            for line in (field.value or "").splitlines():
+                header = COMPACT_LINE_PATTERN.match(line)
+                if header:
+                    slot = header["slot"]
+                    roster.add_slot(slot, int(header["capacity"]))
+                if slot is not None:
+                    for match in MENTION_PATTERN.finditer(line):
+                        roster.signup(int(match.group(1)), slot)
+        return roster
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "EventRoster":
+        """Reconstrói o roster a partir do documento salvo no MongoDB."""
+        roster = cls(
+            author_id=doc["author_id"],
+            title=doc["title"],
+            description=doc["description"],
+            footer=doc.get("footer"),
+            thumbnail_url=doc.get("thumbnail_url"),
+        )
+        for slot in doc.get("slots", []):
+            roster.add_slot(slot["name"], slot.get("capacity", 1))
+            # "user_id": formato antigo, de uma pessoa por vaga.
+            user_ids = slot.get("user_ids") or ([slot["user_id"]] if slot.get("user_id") is not None else [])
+            for user_id in user_ids:
+                roster.signup(user_id, slot["name"])
+        return roster
+
+    def to_document(self) -> dict:
+        return {
+            "author_id": self.author_id,
+            "title": self.title,
+            "description": self.description,
+            "footer": self.footer,
+            "thumbnail_url": self.thumbnail_url,
+            "slots": [
+                {"name": slot, "capacity": self.capacity[slot], "user_ids": list(self.slot_members[slot])}
+                for slot in self.slots
+            ],
+        }
+
+    # --- Consultas ---
+    def has_slot(self, slot: str) -> bool:
+        return slot in self.slot_members
+
+    def members(self, slot: str) -> list[int]:
+        return list(self.slot_members.get(slot, ()))
+
+    def is_full(self, slot: str) -> bool:
+        return len(self.slot_members[slot]) >= self.capacity[slot]
+
+    def slot_of(self, user_id: int) -> str | None:
+        return self.user_to_slot.get(user_id)
+
+    def participants(self) -> list[int]:
+        return [user_id for slot in self.slots for user_id in self.slot_members[slot]]
+
+    @property
+    def is_compact(self) -> bool:
+        """Renderização compacta: vagas com capacidade > 1 ou vagas demais para um campo cada."""
+        return len(self.slots) > EMBED_MAX_FIELDS or any(cap > 1 for cap in self.capacity.values())
+
+    # --- Alterações ---
+    def signup(self, user_id: int, slot: str) -> bool:
+        """Inscreve o usuário numa vaga com lugar livre. Retorna False se não foi possível."""
+        if user_id in self.user_to_slot or slot not in self.slot_members or self.is_full(slot):
+            return False
+        self.slot_members[slot][user_id] = None
+        self.user_to_slot[user_id] = slot
+        self.version += 1
+        return True
+
+    def move(self, user_id: int, old_slot: str, new_slot: str) -> bool:
+        """Troca o usuário de vaga, se ele ainda estiver na antiga e a nova continuar com lugar."""
+        if self.user_to_slot.get(user_id) != old_slot or new_slot not in self.slot_members or self.is_full(new_slot):
+            return False
+        del self.slot_members[old_slot][user_id]
+        self.slot_members[new_slot][user_id] = None
+        self.user_to_slot[user_id] = new_slot
+        self.version += 1
+        return True
+
+    def add_slot(self, slot: str, capacity: int = 1) -> bool:
+        if slot.lower() in self._slot_keys:
+            return False
+        self.slots.append(slot)
+        self.capacity[slot] = capacity
+        self.slot_members[slot] = {}
+        self._slot_keys[slot.lower()] = slot
+        self.version += 1
+        self.layout_version += 1
+        return True
+
+    def remove_slot(self, slot: str) -> bool:
+        if slot not in self.slot_members:
+            return False
+        for user_id in self.slot_members.pop(slot):
+            del self.user_to_slot[user_id]
+        del self.capacity[slot]
+        del self._slot_keys[slot.lower()]
+        self.slots.remove(slot)
+        self.version += 1
+        self.layout_version += 1
+        return True
+
+    # --- Renderização ---
+    def to_embed(self) -> discord.Embed:
+        embed = discord.Embed(title=self.title, description=self.description, color=discord.Color.gold())
+        if self.footer:
+            embed.set_footer(text=self.footer)
+        if self.thumbnail_url:
+            embed.set_thumbnail(url=self.thumbnail_url)
+
+        if not self.is_compact:
+            for slot in self.slots:
+                members = self.slot_members[slot]
+                embed.add_field(name=slot, value=f"<@{next(iter(members))}>" if members else EMPTY_SLOT, inline=False)
+            return embed
+
+        # Vários jogadores por campo, respeitando 25 campos e 6000 caracteres no total.
+        return add_compact_fields(embed, self._compact_lines())
+
+    def _compact_lines(self):
+        """Uma linha por vaga ("**DPS** (3/10): @a @b @c"), quebrada se passar do limite de um campo."""
+        for slot in self.slots:
+            members = self.slot_members[slot]
+            line = f"**{slot}** ({len(members)}/{self.capacity[slot]}):"
+            if not members:
+                yield f"{line} {EMPTY_SLOT}"
+                continue
+            for user_id in members:
+                mention = f" <@{user_id}>"
+                if len(line) + len(mention) > EMBED_FIELD_VALUE_LIMIT:
+                    yield line
+                    line = "↳"
+                line += mention
+            yield line
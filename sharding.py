@@ -0,0 +1,84 @@
+import os
+
+# --- Shards ---
+# O Discord distribui os servidores entre os shards por (guild_id >> 22) % shard_count.
+# O bot roda como AutoShardedBot: sem configuração, um processo conecta todos os
+# shards recomendados pelo Discord. Com SHARD_COUNT e SHARD_IDS, cada processo
+# conecta só a sua faixa de shards e só carrega o estado (eventos, pagamentos,
+# templates) dos servidores desses shards. O estado compartilhado fica no MongoDB.
+#
+#   SHARD_COUNT=4 SHARD_IDS=0-1 python main.py   # processo A
+#   SHARD_COUNT=4 SHARD_IDS=2-3 python main.py   # processo B
+
+
+def shard_of(guild_id: int | None, shard_count: int) -> int:
+    """Shard que recebe os eventos do servidor (mensagens diretas chegam sempre no shard 0)."""
+    if guild_id is None:
+        return 0
+    return (guild_id >> 22) % shard_count
+
+
+def parse_shard_ids(text: str) -> list[int]:
+    """Lê listas como "0,1,2" ou faixas como "0-3,8"."""
+    shard_ids = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+            shard_ids.update(range(start, end + 1))
+        else:
+            shard_ids.add(int(part))
+    return sorted(shard_ids)
+
+
+class ShardConfig:
+    """Quais shards este processo conecta (None = todos)."""
+
+    __slots__ = ("shard_count", "shard_ids", "_owned")
+
+    def __init__(self, shard_count: int = None, shard_ids: list[int] = None):
+        if shard_ids is not None:
+            if shard_count is None:
+                raise ValueError("SHARD_IDS exige SHARD_COUNT.")
+            invalid = [shard_id for shard_id in shard_ids if not 0 <= shard_id < shard_count]
+            if invalid or not shard_ids:
+                raise ValueError(f"SHARD_IDS inválidos para SHARD_COUNT={shard_count}: {invalid or 'nenhum'}.")
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self._owned = frozenset(shard_ids) if shard_ids is not None else None
+
+    @classmethod
+    def from_env(cls) -> "ShardConfig":
+        shard_count = os.getenv("SHARD_COUNT")
+        shard_ids = os.getenv("SHARD_IDS")
+        return cls(
+            shard_count=int(shard_count) if shard_count else None,
+            shard_ids=parse_shard_ids(shard_ids) if shard_ids else None
+        )
+
+    def owns(self, guild_id: int | None) -> bool:
+        """Se os eventos desse servidor chegam a este processo."""
+        if self._owned is None:
+            return True
+        return shard_of(guild_id, self.shard_count) in self._owned
+
+    @property
+    def is_primary(self) -> bool:
+        """O processo com o shard 0 cuida das tarefas globais (ex.: sincronizar os comandos)."""
+        return self._owned is None or 0 in self._owned
+
+    def bot_options(self) -> dict:
+        """Kwargs para o AutoShardedBot."""
+        options = {}
+        if self.shard_count is not None:
+            options["shard_count"] = self.shard_count
+        if self.shard_ids is not None:
+            options["shard_ids"] = self.shard_ids
+        return options
+
+    def describe(self) -> str:
+        if self.shard_ids is None:
+            return f"todos os shards ({self.shard_count or 'automático'})"
+        return f"shards {self.shard_ids} de {self.shard_count}"
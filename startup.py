@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+import time
+
+from metrics import track_mongo
+
+# --- Inicialização ---
+# Medição das fases de inicialização e sincronização dos comandos de barra
+# apenas quando as assinaturas mudaram (o sync global tem rate limit baixo).
+
+COMMAND_SYNC_DOC_ID = "command_sync"
+
+
+class StartupTimer:
+    """Marca o tempo (desde o início do processo) em que cada fase da inicialização terminou."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    def mark(self, phase: str):
+        if phase not in self.phases:
+            self.phases[phase] = time.perf_counter() - self.started_at
+
+    def report(self) -> str:
+        lines = ["Tempos de inicialização:"]
+        for phase, elapsed in sorted(self.phases.items(), key=lambda item: item[1]):
+            lines.append(f"  {phase:<28} {elapsed * 1000:>9.1f} ms")
+        return "\n".join(lines)
+
+
+def command_tree_hash(tree) -> str:
+    """Hash das assinaturas de todos os comandos globais (nome, descrição, parâmetros...)."""
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands()), key=lambda c: c["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def sync_commands_if_changed(tree, meta_collection) -> int | None:
+    """Sincroniza a árvore de comandos só se o hash mudou desde o último sync.
+
+    Retorna o número de comandos sincronizados, ou None se nada mudou.
+    """
+    current_hash = command_tree_hash(tree)
+    try:
+        with track_mongo("load_command_hash"):
+            doc = await meta_collection.find_one({"_id": COMMAND_SYNC_DOC_ID})
+    except Exception:
+        # Sem o hash salvo, sincroniza por segurança.
+        logging.exception("Falha ao ler o hash dos comandos; sincronizando mesmo assim.")
+        doc = None
+
+    if doc and doc.get("hash") == current_hash:
+        return None
+
+    synced = await tree.sync()
+    try:
+        with track_mongo("save_command_hash"):
+            await meta_collection.update_one(
+                {"_id": COMMAND_SYNC_DOC_ID}, {"$set": {"hash": current_hash}}, upsert=True
+            )
+    except Exception:
+        logging.exception("Falha ao salvar o hash dos comandos.")
+    return len(synced)
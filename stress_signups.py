@@ -0,0 +1,88 @@
+"""Teste de estresse do ator de eventos: centenas de cliques simultâneos, nenhuma inscrição perdida.
+
+Uso: python stress_signups.py [--clicks 500] [--slots 60] [--capacity 5]
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+from edit_coalescer import EditCoalescer
+from event_actor import EventActor
+from roster import COMPACT_LINE_PATTERN, MENTION_PATTERN, EventRoster
+
+
+class FakeMessage:
+    """Mensagem falsa: cada edit demora um pouco, como uma chamada real à API."""
+
+    def __init__(self, message_id: int):
+        self.id = message_id
+        self.embed = None
+        self.edits = 0
+
+    async def edit(self, embed=None, view=None):
+        await asyncio.sleep(random.uniform(0.001, 0.02))
+        self.embed = embed
+        self.edits += 1
+
+
+def rendered_signups(embed) -> dict[int, str] | None:
+    """Lê usuário -> vaga do embed final (normal ou compacto). None se alguém aparecer duas vezes."""
+    rendered = {}
+    for field in embed.fields:
+        slot = field.name
+        for line in field.value.splitlines():
+            header = COMPACT_LINE_PATTERN.match(line)
+            if header:
+                slot = header["slot"]
+            for match in MENTION_PATTERN.finditer(line):
+                user_id = int(match.group(1))
+                if user_id in rendered:
+                    print(f"FALHA: usuário {user_id} aparece em mais de uma vaga.")
+                    return None
+                rendered[user_id] = slot
+    return rendered
+
+
+async def run(clicks: int, slots: int, capacity: int) -> bool:
+    coalescer = EditCoalescer(window=0.05)
+
+    async def publish(message, roster, layout_changed):
+        coalescer.mark_dirty(message, lambda: {"embed": roster.to_embed()})
+
+    roster = EventRoster(author_id=0, title="Estresse", description="", slots=[f"Vaga {i} x{capacity}" for i in range(slots)])
+    message = FakeMessage(1)
+    actor = EventActor(message, roster, publish=publish, idle_timeout=0.5)
+
+    async def click(user_id: int):
+        # Jitter para embaralhar a ordem de chegada dos cliques.
+        await asyncio.sleep(random.uniform(0, 0.05))
+        slot = f"Vaga {random.randrange(slots)}"
+        return user_id, slot, await actor.submit(lambda r: r.signup(user_id, slot))
+
+    results = await asyncio.gather(*(click(user_id) for user_id in range(1, clicks + 1)))
+    await actor.task
+    await coalescer.drain()
+
+    accepted = {user_id: slot for user_id, slot, ok in results if ok}
+    rendered = rendered_signups(message.embed)
+    if rendered is None:
+        return False
+
+    saved = coalescer.stats()["event"]["saved"]
+    print(f"{clicks} cliques, {len(accepted)} inscrições aceitas, {message.edits} edit(s) na mensagem ({saved:.0f} economizados).")
+    if rendered != accepted:
+        lost = set(accepted) - set(rendered)
+        print(f"FALHA: {len(lost)} inscrição(ões) aceita(s) não aparecem na mensagem final.")
+        return False
+    print("OK: nenhuma inscrição perdida.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=60)
+    parser.add_argument("--capacity", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.clicks, args.slots, args.capacity)) else 1)
@@ -0,0 +1,246 @@
+import bisect
+import datetime
+import itertools
+import logging
+
+from pymongo import ASCENDING, UpdateOne
+
+from metrics import track_mongo
+
+# --- Store de Templates ---
+# Leituras são servidas do dicionário em memória; escritas vão direto para o
+# MongoDB (driver assíncrono) e só atualizam o cache depois de confirmadas.
+#
+# Cada template é um documento próprio, identificado por (guild_id, name).
+# Templates com guild_id None são globais (vieram do antigo documento único)
+# e ficam visíveis em todos os servidores. Um servidor não exclui um global,
+# mas pode escondê-lo: um documento (guild_id, name) com hidden=True, que só
+# vale para aquele servidor.
+#
+# Para o autocomplete, cada escopo também mantém a lista ordenada dos nomes:
+# a busca por prefixo é feita com bisect, sem tocar no MongoDB.
+#
+# Exclusões são lápides (deleted=True) e toda escrita atualiza `updated_at`,
+# para que outras instâncias vejam a alteração tanto pelo change stream quanto
+# pela consulta periódica (ver template_watcher.py). As lápides são apagadas
+# pelo índice TTL em `deleted_at` depois de TOMBSTONE_TTL segundos.
+
+LEGACY_TEMPLATES_DOC_ID = "global_templates"
+GLOBAL_SCOPE = None
+TOMBSTONE_TTL = 24 * 60 * 60
+
+
+class TemplateStore:
+    """Cache em memória dos templates com escrita direta (write-through) no MongoDB."""
+
+    def __init__(self, collection, legacy_collection=None):
+        self.collection = collection
+        self.legacy_collection = legacy_collection
+        # guild_id (ou None para os globais) -> {nome: [vagas]}
+        self.cache: dict[int | None, dict[str, list[str]]] = {}
+        # guild_id (ou None) -> nomes ordenados, para a busca por prefixo
+        self._sorted_names: dict[int | None, list[str]] = {}
+        # guild_id -> nomes de templates globais escondidos no servidor
+        self.hidden: dict[int, set[str]] = {}
+        # _id do documento -> (guild_id, nome), para aplicar exclusões vindas do change stream
+        self._keys: dict = {}
+        # Maior `updated_at` já visto: ponto de partida da consulta periódica.
+        self.high_water: datetime.datetime | None = None
+        self.owns = None
+
+    async def load(self, owns=None):
+        """Garante os índices, migra o documento antigo e carrega os templates para o cache.
+
+        `owns(guild_id)` limita o cache aos servidores deste processo (os globais sempre entram).
+        """
+        self.owns = owns
+        with track_mongo("create_index_templates"):
+            await self.collection.create_index(
+                [("guild_id", ASCENDING), ("name", ASCENDING)], unique=True
+            )
+            await self.collection.create_index([("updated_at", ASCENDING)])
+            await self.collection.create_index([("deleted_at", ASCENDING)], expireAfterSeconds=TOMBSTONE_TTL)
+        await self.migrate_legacy()
+        await self.reload()
+
+    async def reload(self):
+        """Relê a coleção inteira (na inicialização ou se o change stream perder o histórico)."""
+        cache, hidden, keys, high_water = {}, {}, {}, None
+        projection = {"guild_id": 1, "name": 1, "roles": 1, "hidden": 1, "updated_at": 1}
+        with track_mongo("load_templates"):
+            async for doc in self.collection.find({"deleted": {"$ne": True}}, projection):
+                guild_id = doc.get("guild_id")
+                if doc.get("updated_at") and (high_water is None or doc["updated_at"] > high_water):
+                    high_water = doc["updated_at"]
+                if not self._owns(guild_id):
+                    continue
+                if doc.get("hidden"):
+                    hidden.setdefault(guild_id, set()).add(doc["name"])
+                else:
+                    cache.setdefault(guild_id, {})[doc["name"]] = doc["roles"]
+                keys[doc["_id"]] = (guild_id, doc["name"])
+        self.cache = cache
+        self.hidden = hidden
+        self._keys = keys
+        self._sorted_names = {scope: sorted(names) for scope, names in cache.items()}
+        self.high_water = high_water
+        total = sum(len(scope) for scope in cache.values())
+        logging.info(f"{total} template(s) carregado(s) do MongoDB.")
+
+    def _owns(self, guild_id: int | None) -> bool:
+        return guild_id is GLOBAL_SCOPE or self.owns is None or self.owns(guild_id)
+
+    async def migrate_legacy(self):
+        """Copia os templates do antigo documento `global_templates` para documentos individuais."""
+        if self.legacy_collection is None:
+            return
+        with track_mongo("load_legacy_templates"):
+            legacy = await self.legacy_collection.find_one({"_id": LEGACY_TEMPLATES_DOC_ID})
+        if not legacy or legacy.get("migrated") or not legacy.get("templates"):
+            return
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # $setOnInsert: nunca sobrescreve um template que já exista no formato novo.
+        operations = [
+            UpdateOne(
+                {"guild_id": GLOBAL_SCOPE, "name": name},
+                {"$setOnInsert": {"roles": roles, "updated_at": now}},
+                upsert=True
+            )
+            for name, roles in legacy["templates"].items()
+        ]
+        with track_mongo("migrate_templates"):
+            await self.collection.bulk_write(operations, ordered=False)
+            await self.legacy_collection.update_one(
+                {"_id": LEGACY_TEMPLATES_DOC_ID}, {"$set": {"migrated": True}}
+            )
+        logging.info(f"{len(operations)} template(s) migrado(s) do documento global.")
+
+    def get(self, guild_id: int | None, name: str) -> list[str] | None:
+        """Busca um template do servidor, caindo para os globais (não escondidos) se não existir."""
+        name = name.strip().lower()
+        roles = self.cache.get(guild_id, {}).get(name)
+        if roles is None and name not in self.hidden.get(guild_id, ()):
+            roles = self.cache.get(GLOBAL_SCOPE, {}).get(name)
+        return roles
+
+    def is_global(self, guild_id: int | None, name: str) -> bool:
+        """True se o nome só existe (visível) como template global neste servidor."""
+        return name not in self.cache.get(guild_id, {}) and self.get(guild_id, name) is not None
+
+    def for_guild(self, guild_id: int | None) -> dict[str, list[str]]:
+        """Templates visíveis no servidor (os do servidor têm prioridade sobre os globais)."""
+        hidden = self.hidden.get(guild_id, ())
+        merged = {name: roles for name, roles in self.cache.get(GLOBAL_SCOPE, {}).items() if name not in hidden}
+        merged.update(self.cache.get(guild_id, {}))
+        return dict(sorted(merged.items()))
+
+    async def save(self, guild_id: int | None, name: str, roles: list[str]):
+        with track_mongo("save_template"):
+            await self.collection.update_one(
+                {"guild_id": guild_id, "name": name},
+                {
+                    "$set": {"roles": roles, "deleted": False, "updated_at": datetime.datetime.now(datetime.timezone.utc)},
+                    # Recriar um template excluído reaproveita a lápide, que deixa de expirar
+                    # (e um global escondido com o mesmo nome volta a aparecer se este for excluído).
+                    "$unset": {"deleted_at": "", "hidden": ""},
+                },
+                upsert=True
+            )
+        self._unhide(guild_id, name)
+        self._put(guild_id, name, roles)
+
+    async def delete(self, guild_id: int | None, name: str) -> bool:
+        """Exclui o template do servidor. Os globais (vistos em todos os servidores) não são tocados."""
+        if name not in self.cache.get(guild_id, {}):
+            return False
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with track_mongo("delete_template"):
+            result = await self.collection.update_one(
+                {"guild_id": guild_id, "name": name, "deleted": {"$ne": True}},
+                {"$set": {"deleted": True, "deleted_at": now, "updated_at": now}}
+            )
+        self._remove(guild_id, name)
+        return bool(result.modified_count)
+
+    async def hide(self, guild_id: int, name: str) -> bool:
+        """Esconde um template global só neste servidor. False se não há global visível com o nome."""
+        if not self.is_global(guild_id, name):
+            return False
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with track_mongo("hide_template"):
+            await self.collection.update_one(
+                {"guild_id": guild_id, "name": name},
+                # Pode reaproveitar a lápide de um template do servidor com o mesmo nome.
+                {"$set": {"hidden": True, "deleted": False, "updated_at": now}, "$unset": {"roles": "", "deleted_at": ""}},
+                upsert=True
+            )
+        self.hidden.setdefault(guild_id, set()).add(name)
+        return True
+
+    # --- Atualizações incrementais do cache ---
+    def _put(self, guild_id: int | None, name: str, roles: list[str]):
+        scope = self.cache.setdefault(guild_id, {})
+        if name not in scope:
+            bisect.insort(self._sorted_names.setdefault(guild_id, []), name)
+        scope[name] = roles
+
+    def _unhide(self, guild_id: int | None, name: str):
+        self.hidden.get(guild_id, set()).discard(name)
+
+    def _remove(self, guild_id: int | None, name: str):
+        if self.cache.get(guild_id, {}).pop(name, None) is None:
+            return
+        names = self._sorted_names.get(guild_id, [])
+        index = bisect.bisect_left(names, name)
+        if index < len(names) and names[index] == name:
+            del names[index]
+
+    def apply_document(self, doc: dict):
+        """Aplica ao cache o estado atual de um documento (criado, alterado ou lápide)."""
+        guild_id = doc.get("guild_id")
+        updated_at = doc.get("updated_at")
+        if updated_at and (self.high_water is None or updated_at > self.high_water):
+            self.high_water = updated_at
+        if not self._owns(guild_id):
+            return
+        previous = self._keys.get(doc["_id"])
+        if previous and previous != (guild_id, doc["name"]):
+            # Documento renomeado (ou movido de servidor) direto no banco.
+            self._remove(*previous)
+        if doc.get("deleted"):
+            self._keys.pop(doc["_id"], None)
+            self._remove(guild_id, doc["name"])
+            self._unhide(guild_id, doc["name"])
+        elif doc.get("hidden"):
+            self._keys[doc["_id"]] = (guild_id, doc["name"])
+            self._remove(guild_id, doc["name"])
+            self.hidden.setdefault(guild_id, set()).add(doc["name"])
+        else:
+            self._keys[doc["_id"]] = (guild_id, doc["name"])
+            self._unhide(guild_id, doc["name"])
+            self._put(guild_id, doc["name"], doc["roles"])
+
+    def apply_removal(self, doc_id):
+        """Documento apagado de verdade (ex.: pelo índice TTL ou por um admin direto no banco)."""
+        key = self._keys.pop(doc_id, None)
+        if key:
+            self._remove(*key)
+            self._unhide(*key)
+
+    def suggest(self, guild_id: int | None, prefix: str, limit: int = 25) -> list[str]:
+        """Nomes de templates visíveis no servidor que começam com `prefix` (para o autocomplete)."""
+        prefix = prefix.strip().lower()
+        matches = set()
+        # Os `limit` primeiros (visíveis) de cada escopo bastam para os `limit` primeiros da união.
+        for scope in (guild_id, GLOBAL_SCOPE):
+            hidden = self.hidden.get(guild_id, ()) if scope is GLOBAL_SCOPE else ()
+            names = self._sorted_names.get(scope, [])
+            found = 0
+            for name in itertools.islice(names, bisect.bisect_left(names, prefix), None):
+                if found == limit or not name.startswith(prefix):
+                    break
+                if name not in hidden:
+                    matches.add(name)
+                    found += 1
+        return sorted(matches)[:limit]
@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+import logging
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from metrics import counter, gauge
+from template_store import TemplateStore
+
+# --- Sincronização dos Templates entre Instâncias ---
+# Cada instância mantém os templates em memória. Este watcher aplica ao cache,
+# um documento por vez, as alterações feitas por outras instâncias (ou direto
+# no banco), sem reler a coleção inteira:
+#
+# - Change stream (replica set / Atlas): alterações chegam na hora. O resume
+#   token permite continuar de onde parou depois de uma queda de conexão.
+# - Consulta periódica (MongoDB standalone, sem change streams): busca a cada
+#   `poll_interval` os documentos com `updated_at` recente. Exclusões chegam
+#   como lápides (deleted=True), por isso aparecem na consulta.
+#
+# Se o histórico do change stream se perder (token expirado, coleção apagada),
+# a coleção é relida uma vez e o stream recomeça do zero.
+
+# Códigos de erro do servidor
+CHANGE_STREAMS_UNSUPPORTED = 40573
+CHANGE_STREAM_FATAL_ERRORS = {
+    136,  # CappedPositionLost
+    260,  # InvalidResumeToken
+    280,  # ChangeStreamFatalError
+    286,  # ChangeStreamHistoryLost
+}
+
+changes_applied = counter("template_changes_applied_total", "Alterações de templates aplicadas ao cache, por origem.")
+watcher_mode = gauge("template_watcher_change_stream", "1 se os templates são sincronizados por change stream, 0 se por consulta periódica.")
+
+
+class ChangeStreamInvalidated(Exception):
+    """A coleção foi apagada ou renomeada: o stream precisa recomeçar sem o token."""
+
+
+class TemplateWatcher:
+    """Mantém o cache do TemplateStore atualizado com as alterações de outras instâncias."""
+
+    def __init__(self, store: TemplateStore, poll_interval: float = 0.5, overlap: float = 5.0,
+                 force_polling: bool = False):
+        self.store = store
+        self.poll_interval = poll_interval
+        # As consultas voltam `overlap` segundos para não perder escritas de instâncias
+        # com o relógio um pouco atrasado (aplicar o mesmo documento de novo não muda nada).
+        self.overlap = datetime.timedelta(seconds=overlap)
+        self.force_polling = force_polling
+        self.resume_token = None
+        self.mode = None
+        # Motivo da releitura da coleção ainda por fazer; ela roda dentro do retry, com backoff.
+        self.pending_reload: str | None = None
+
+    async def run(self):
+        delay = 1
+        while True:
+            try:
+                if self.pending_reload is not None:
+                    await self._restart_from_scratch(self.pending_reload)
+                    self.pending_reload = None
+                if self.force_polling:
+                    await self._poll_forever()
+                await self._watch()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logging.info("Change streams indisponíveis (MongoDB sem replica set); usando consulta periódica.")
+                    self.force_polling = True
+                    continue
+                if e.code in CHANGE_STREAM_FATAL_ERRORS:
+                    self.pending_reload = f"histórico do change stream perdido ({e.code})"
+                    continue
+                logging.warning(f"Falha no change stream dos templates ({e}); nova tentativa em {delay}s.")
+            except ChangeStreamInvalidated as e:
+                self.pending_reload = str(e)
+                continue
+            except PyMongoError as e:
+                logging.warning(f"Falha ao sincronizar os templates ({e}); nova tentativa em {delay}s.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    async def _restart_from_scratch(self, reason: str):
+        logging.warning(f"Templates: {reason}; relendo a coleção.")
+        self.resume_token = None
+        await self.store.reload()
+
+    async def _watch(self):
+        async with await self.store.collection.watch(
+            full_document="updateLookup",
+            resume_after=self.resume_token,
+            max_await_time_ms=int(self.poll_interval * 1000)
+        ) as stream:
+            if self.mode != "change_stream":
+                logging.info("Sincronizando templates por change stream.")
+            self.mode = "change_stream"
+            watcher_mode.set(1)
+            if self.resume_token is None:
+                # Cobre as escritas entre a carga inicial (ou releitura) e a abertura do stream.
+                await self.poll_once()
+            async for change in stream:
+                self.apply_change(change)
+                self.resume_token = stream.resume_token
+
+    def apply_change(self, change: dict):
+        operation = change["operationType"]
+        if operation in ("insert", "update", "replace"):
+            # Com updateLookup, o documento é o estado atual (None se já foi apagado depois).
+            doc = change.get("fullDocument")
+            if doc is not None:
+                self.store.apply_document(doc)
+                changes_applied.inc(source="change_stream")
+        elif operation == "delete":
+            self.store.apply_removal(change["documentKey"]["_id"])
+            changes_applied.inc(source="change_stream")
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            raise ChangeStreamInvalidated(f"coleção de templates invalidada ({operation})")
+
+    async def _poll_forever(self):
+        self.mode = "polling"
+        watcher_mode.set(0)
+        while True:
+            await self.poll_once()
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll_once(self) -> int:
+        """Aplica os documentos alterados desde o último `updated_at` visto."""
+        previous = self.store.high_water
+        if previous is None:
+            query = {"updated_at": {"$exists": True}}
+        else:
+            query = {"updated_at": {"$gte": previous - self.overlap}}
+        applied = 0
+        async for doc in self.store.collection.find(query, {"guild_id": 1, "name": 1, "roles": 1, "deleted": 1, "hidden": 1, "updated_at": 1}):
+            self.store.apply_document(doc)
+            # Documentos da janela de sobreposição já aplicados antes não contam de novo.
+            if previous is None or doc["updated_at"] > previous:
+                applied += 1
+        if applied:
+            changes_applied.inc(applied, source="poll")
+        return applied